@@ -0,0 +1,57 @@
+#!/bin/env python3
+"""
+Cold-start benchmark of the parsing and conversion modules.
+
+Every module is imported in a fresh interpreter. The run fails if an import takes longer
+than its budget, or if it pulls in matplotlib, which alone costs about a second.
+
+Usage: python3 bench_startup.py [repetitions]
+"""
+import os
+import subprocess
+import sys
+import time
+
+# Import time budget in milliseconds, on top of starting an empty interpreter
+BUDGETS_MS = {
+    "input_parser": 100,
+    "twc_output": 400,
+    "rle": 400,
+    "maple_loops": 400,
+    "plot_log_timing": 100,
+}
+
+PROBE = "import sys, {module}; sys.exit('matplotlib' in sys.modules)"
+
+
+def cold_start_ms(code, repetitions):
+    """Best-of-n wall time of running `code` in a fresh interpreter."""
+    best = float("inf")
+    here = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=here)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result.returncode
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    baseline, _ = cold_start_ms("pass", repetitions)
+    print(f"{'interpreter':<16}{baseline:8.1f} ms")
+
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        total, loaded_matplotlib = cold_start_ms(PROBE.format(module=module), repetitions)
+        cost = total - baseline
+        status = "ok"
+        if loaded_matplotlib:
+            status = "FAIL (imports matplotlib)"
+            failed = True
+        elif cost > budget:
+            status = f"FAIL (budget {budget} ms)"
+            failed = True
+        print(f"{module:<16}{cost:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
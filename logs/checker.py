@@ -0,0 +1,249 @@
+#!/bin/env python3
+"""
+Run the trustworthiness checker (TWC) with several specs against one LOLA input at once.
+
+The checker is started through a backend:
+
+    - DockerBackend: the container image, as capture.sh runs it
+    - LocalBackend: a checker binary on this machine
+    - PythonBackend: a Python function standing in for the checker, e.g. `echo_checker`
+
+At most `workers` checkers run at the same time. The output of every checker is parsed into
+RLE streams while it runs, and also written to a TWC-output file like `tee` in capture.sh.
+A checker that runs longer than the timeout is killed; failed runs are retried. Only the
+output streams declared in a spec (see lola_spec.py) are kept from its output.
+
+Usage: python3 checker.py MAPE.input spec1.lola spec2.lola --backend docker --specs-dir LOLA_specs
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import NamedTuple
+
+from lola_spec import read_spec
+from twc_output import OutputCollector
+
+DOCKER_IMAGE = "localhost/trustworthiness-checker"
+
+# Seconds a timed out checker gets to stop after SIGTERM before it is killed. The docker client
+# forwards SIGTERM to the container, SIGKILL would leave the container running.
+KILL_GRACE = 5
+
+
+class CheckerError(Exception):
+    pass
+
+
+class CheckResult(NamedTuple):
+    spec: str
+    streams: dict
+    """Parsed output, {stream name: RLEStream}"""
+    returncode: int
+    attempts: int
+    elapsed: float
+    output_file: str
+
+
+class DockerBackend:
+    """Run the checker image with the spec and input directories mounted, like capture.sh."""
+
+    def __init__(self, specs_dir, image=DOCKER_IMAGE):
+        self.specs_dir = os.path.abspath(specs_dir)
+        self.image = image
+
+    def command(self, spec, input_file):
+        input_file = os.path.abspath(input_file)
+        return [
+            "docker", "run", "--network", "host", "--rm", "-e", "RUST_BACKTRACE=full",
+            "-v", f"{self.specs_dir}:/mnt/host_models",
+            "-v", f"{os.path.dirname(input_file)}:/mnt/host_input",
+            self.image,
+            f"/mnt/host_models/{spec}",
+            "--input-file", f"/mnt/host_input/{os.path.basename(input_file)}",
+        ]
+
+
+class LocalBackend:
+    """Run a checker binary installed on this machine."""
+
+    def __init__(self, specs_dir, binary="trustworthiness-checker"):
+        self.specs_dir = specs_dir
+        self.binary = binary
+
+    def command(self, spec, input_file):
+        return [self.binary, os.path.join(self.specs_dir, spec), "--input-file", input_file]
+
+
+class PythonBackend:
+    """Stand-in for the checker: `func(spec, input_file)` returns the output lines. It runs in
+    a thread, so it cannot be killed on timeout; the result is discarded instead."""
+
+    def __init__(self, func):
+        self.func = func
+
+
+def echo_checker(spec, input_file):
+    """A checker stand-in echoing every input stream `x` as output stream `xEcho`."""
+    from input_parser import parse_lines
+
+    type_names = {bool: "Bool", int: "Int", float: "Float", str: "Str"}
+    with open(input_file) as f:
+        for step, stream, value in parse_lines(f):
+            if isinstance(value, bool):
+                formatted = "true" if value else "false"
+            elif isinstance(value, str):
+                formatted = f'"{value}"'
+            else:
+                formatted = str(value)
+            yield f"{stream}Echo[{step}] = {type_names[type(value)]}({formatted})\n"
+
+
+def output_file_name(spec):
+    return f"TWC-output-{os.path.splitext(os.path.basename(spec))[0]}.txt"
+
+
+async def run_process(command, collector, out):
+    """Run a checker process and feed every line of its output to the collector.
+    stderr is merged into the output, like `2>&1 | tee` in capture.sh. The process is stopped
+    if anything fails while it runs, e.g. on a timeout or an unparseable output line."""
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, start_new_session=True
+    )
+    try:
+        async for raw in process.stdout:
+            line = raw.decode(errors="replace")
+            out.write(line)
+            collector.feed(line)
+        return await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            await stop_process(process)
+        raise
+
+
+async def stop_process(process):
+    """Stop a checker and everything it started, as it runs in its own process group."""
+    for sig, grace in [(signal.SIGTERM, KILL_GRACE), (signal.SIGKILL, None)]:
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), grace)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def run_function(func, spec, input_file, collector, out):
+    def run():
+        for line in func(spec, input_file):
+            out.write(line)
+            collector.feed(line)
+
+    await asyncio.to_thread(run)
+    return 0
+
+
+async def check(backend, spec, input_file, output_dir, streams=None, timeout=None, retries=1):
+    """Run one spec, retrying on a non-zero exit code or timeout.
+
+    Raises:
+        CheckerError: All attempts failed, or the output could not be parsed
+    """
+    output_file = os.path.join(output_dir, output_file_name(spec))
+    start = time.perf_counter()
+    error = None
+
+    for attempt in range(1, retries + 2):
+        collector = OutputCollector(streams)
+        with open(output_file, "w") as out:
+            if isinstance(backend, PythonBackend):
+                job = run_function(backend.func, spec, input_file, collector, out)
+            else:
+                job = run_process(backend.command(spec, input_file), collector, out)
+            try:
+                returncode = await asyncio.wait_for(job, timeout)
+            except asyncio.TimeoutError:
+                error = f"timed out after {timeout} s"
+                continue
+            except ValueError as e:
+                raise CheckerError(f"{spec}: bad output line ({e})") from e
+        if returncode == 0:
+            return CheckResult(spec, collector.build(), returncode, attempt, time.perf_counter() - start, output_file)
+        error = f"exit code {returncode}"
+
+    raise CheckerError(f"{spec}: {error} ({retries + 1} attempts)")
+
+
+async def check_specs(backend, input_file, specs, output_dir, workers=4, streams=None, timeout=None, retries=1):
+    """Check one input against several specs, with at most `workers` checkers at a time.
+
+    Args:
+        streams (dict[str, list], optional): Output streams to keep of every spec. All streams
+            are kept for specs that are not in it.
+
+    Returns:
+        dict[str, CheckResult | CheckerError]: Result of every spec, in the order of `specs`
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pool = asyncio.Semaphore(workers)
+
+    async def bounded(spec):
+        async with pool:
+            spec_streams = streams.get(spec) if streams else None
+            return await check(backend, spec, input_file, output_dir, spec_streams, timeout, retries)
+
+    results = await asyncio.gather(*(bounded(spec) for spec in specs), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, CheckerError):
+            raise result
+    return dict(zip(specs, results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a LOLA input against several specs")
+    parser.add_argument("input", help="LOLA input file", type=str)
+    parser.add_argument("specs", nargs="+", help="Spec file names, relative to --specs-dir")
+    parser.add_argument("--backend", choices=["docker", "local", "python"], default="docker")
+    parser.add_argument("--specs-dir", help="Directory of the specs", type=str, default=".")
+    parser.add_argument("--binary", help="local: checker binary", type=str, default="trustworthiness-checker")
+    parser.add_argument("--image", help="docker: checker image", type=str, default=DOCKER_IMAGE)
+    parser.add_argument("-j", "--jobs", help="Checkers running at the same time", type=int, default=4)
+    parser.add_argument("--timeout", help="Seconds before a checker is killed", type=float)
+    parser.add_argument("--retries", help="Retries of a failed check", type=int, default=1)
+    parser.add_argument("-o", "--output-dir", help="Where to write the outputs (default: next to the input)", type=str)
+    args = parser.parse_args()
+
+    if args.backend == "docker":
+        backend = DockerBackend(args.specs_dir, args.image)
+    elif args.backend == "local":
+        backend = LocalBackend(args.specs_dir, args.binary)
+    else:
+        backend = PythonBackend(echo_checker)
+
+    streams = dict()
+    for spec in args.specs:
+        path = os.path.join(args.specs_dir, spec)
+        outputs = list(read_spec(path).outputs) if os.path.isfile(path) else []
+        if outputs:
+            streams[spec] = outputs
+
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.input))
+    start = time.perf_counter()
+    results = asyncio.run(
+        check_specs(backend, args.input, args.specs, output_dir, args.jobs, streams, args.timeout, args.retries)
+    )
+
+    failed = False
+    for spec, result in results.items():
+        if isinstance(result, CheckerError):
+            print(f"{spec}: FAILED, {result}", file=sys.stderr)
+            failed = True
+            continue
+        print(f"{spec}: {len(result.streams)} streams in {result.elapsed:.2f} s ({result.attempts} attempts) -> {result.output_file}")
+    print(f"total: {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    sys.exit(1 if failed else 0)
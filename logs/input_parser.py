@@ -1,10 +1,19 @@
 #!/bin/env python3
+from __future__ import annotations
+
 import argparse
 import re
-from matplotlib.figure import Figure
-from matplotlib.axes import Axes
-import matplotlib.pyplot as plt
-from matplotlib.collections import PolyCollection
+import sys
+import warnings
+from typing import TYPE_CHECKING
+
+from plotting import pyplot
+
+# matplotlib and numpy are only imported by the functions that need them,
+# so parsing and conversion do not pay for importing them
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+    from matplotlib.axes import Axes
 
 
 def chain(initial_value, *funcs):
@@ -32,7 +41,7 @@ MAYBE_COMMENT = f"({COMMENT})?"
 WHITESPACE = r"\s*"
 INDEX = r"(\d+)"
 SEP = ":"
-STREAM = r"([a-zA-Z]+)"
+STREAM = r"([a-zA-Z][a-zA-Z0-9]*)"
 EQ = "="
 VAL = r'((true|false)|(\d+)|"(.*)")'
 
@@ -49,23 +58,19 @@ def join_pattern(*tokens):
     return pattern
 
 
-def parse(inp: str):
-    """Parse an input LOLA specification to an internal data structure.
+def parse_lines(lines):
+    """Parse the lines of an input LOLA specification one at a time.
 
     Args:
-        inp (str): String containing the contents of a LOLA input specification
+        lines (Iterable[str]): Lines of a LOLA input specification
 
     Raises:
         Exception: Bad line. Does not match any defined patterns.
 
-    Returns:
-        dict: Each item in the result corresponds to a time step, with the step as 
-              the key and the value being another dict of all streams and their value 
-              at this step.
+    Yields:
+        tuple[int, str, Any]: (step, stream, value) for every stream input
     """
-    lines = inp.split("\n")
     idx = None
-    steps = {}
 
     for line in lines:
         # Ignore comments
@@ -78,9 +83,6 @@ def parse(inp: str):
         if m:
             idx, stream, raw_val, val_bool, val_int, val_str = m.groups()
             idx = int(idx)
-
-            if idx not in steps:
-                steps[idx] = dict()
         else:
             # Multiple streams in the same time step can omit the "i:" part and use the step index from the previous line
             m = re.match(join_pattern(STREAM, EQ, VAL), line)
@@ -101,79 +103,203 @@ def parse(inp: str):
             case _:
                 val = raw_val
 
+        yield idx, stream, val
+
+
+def parse(inp: str):
+    """Parse an input LOLA specification to an internal data structure.
+
+    Args:
+        inp (str): String containing the contents of a LOLA input specification
+
+    Raises:
+        Exception: Bad line. Does not match any defined patterns.
+
+    Returns:
+        dict: Each item in the result corresponds to a time step, with the step as 
+              the key and the value being another dict of all streams and their value 
+              at this step.
+    """
+    return collect_steps(parse_lines(inp.split("\n")))
+
+
+def collect_steps(events):
+    """Collect parsed (step, stream, value) events into the structure returned by parse."""
+    steps = {}
+
+    for idx, stream, val in events:
+        if idx not in steps:
+            steps[idx] = dict()
         steps[idx][stream] = val
 
     return steps
 
 
-def format_atomic(parsed: dict):
+def parse_rle(inp: str):
+    """Parse an input LOLA specification directly to run-length encoded streams.
+
+    Args:
+        inp (str): String containing the contents of a LOLA input specification
+
+    Returns:
+        dict[str, RLEStream]: One stream per input stream name
+    """
+    return collect_rle(parse_lines(inp.split("\n")))
+
+
+def collect_rle(events):
+    """Collect parsed (step, stream, value) events into run-length encoded streams, like parse_rle."""
+    from rle import RLEBuilder
+
+    builders = {}
+
+    for idx, stream, val in events:
+        if stream not in builders:
+            builders[stream] = RLEBuilder()
+        builders[stream].append(idx, val)
+
+    return {k: b.build() for k, b in builders.items()}
+
+
+def group_steps(events):
+    """Group parsed stream inputs by time step. A step is yielded as soon as the next one
+    starts, so the input can be consumed as a stream.
+
+    Args:
+        events (Iterable[tuple[int, str, Any]]): Output from parse_lines
+
+    Yields:
+        tuple[int, dict]: (step, {stream: value})
+    """
+    idx = None
+    streams = None
+    for step, stream, val in events:
+        if step != idx:
+            if streams is not None:
+                yield idx, streams
+            idx, streams = step, dict()
+        streams[stream] = val
+
+    if streams is not None:
+        yield idx, streams
+
+
+def add_diagnostic(diagnostics, step, message):
+    """Record a problem found in a trace. Without a diagnostics list, a warning is issued instead."""
+    if diagnostics is None:
+        warnings.warn(f"Step {step}: {message}")
+    else:
+        diagnostics.append((step, message))
+
+
+def iter_atomic(steps, diagnostics=None):
+    """Read the events of the "atomicstage" stream one step at a time.
+    Steps without a stage, or with a value that does not match a MAPLE stage, are skipped and
+    added to the diagnostics.
+
+    Args:
+        steps (Iterable[tuple[int, dict]]): (step, streams) pairs, e.g. parsed.items() or group_steps
+        diagnostics (list, optional): List that (step, message) pairs of skipped steps are appended to
+
+    Yields:
+        tuple[str, tuple[int, str, str]]: (phase_key, (step, start/end, extra))
+    """
+    for step, streams in steps:
+        val = streams.get("atomicstage")
+        if val is None:
+            add_diagnostic(diagnostics, step, "Missing stage")
+            continue
+        m = re.fullmatch(r"(start|end)_([maple])(.*)?", val)
+        if m is None:
+            add_diagnostic(diagnostics, step, f"Stage not matching: {val}")
+            continue
+        lifecycle, stage, extra = m.groups()
+        yield stage, (step, lifecycle, extra)
+
+
+def format_atomic(parsed, diagnostics=None):
     """The "atomicity" tests is based on the "atomicstage" stream with values "start_x"/"end_x".
     This gets this "x" which corresponds to the phase of the MAPLE loop and saves whether the event is a "start" or and "end".
     Additionally, the phase can have an additional comment "end_aok" (Normal analysis result) "end_anom" (anomaly in analysis result).
     This extra comment is also saved
 
     Args:
-        parsed (dict): Dictionary of streams as returned by the parsing step
-
-    Raises:
-        Exception: Missing stage
-        Exception: Stage does not match MAPLE
+        parsed (dict | Iterable[tuple[int, dict]]): Dictionary of streams as returned by the parsing step,
+            or a stream of (step, streams) pairs from group_steps
+        diagnostics (list, optional): Collects (step, message) for steps that could not be used
 
     Returns:
         dict: {phase_key: [step, start/end, extra]}
     """
+    if isinstance(parsed, dict):
+        parsed = parsed.items()
+
     stages = {}
-    for step, streams in parsed.items():
-        val = streams.get("atomicstage")
-        if val is None:
-            raise Exception("Missing stage in step", step)
-        m = re.fullmatch(r"(start|end)_([maple])(.*)?", val)
-        if m is None:
-            raise Exception("Stage not matching:", val)
-        lifecycle, stage, extra = m.groups()
+    for stage, event in iter_atomic(parsed, diagnostics):
         if stage not in stages:
             stages[stage] = []
-        stages[stage].append((step, lifecycle, extra))
+        stages[stage].append(event)
 
     return stages
 
 
-def plot_maple_stages(data):
+def create_boxes(data: list[tuple[int, str, str]], trace_start: int, trace_end: int, diagnostics=None):
+    """From a list of (atomic) events of one phase, create a list with the start and end steps of every box.
+    An end without a start is clipped to the trace start, and a start without an end stays open until the trace end.
+
+    Returns:
+        list[tuple[int, int, str]]: (start step, end step, label)
+    """
+    boxes: list[tuple[int, int, str]] = []
+    starts = []
+    for step, lifecycle, extra in data:
+        match lifecycle:
+            case "start":
+                starts.append((step, extra))
+            case "end":
+                if starts:
+                    start_step, start_extra = starts.pop()
+                else:
+                    add_diagnostic(diagnostics, step, "End without a start")
+                    start_step, start_extra = trace_start, ""
+                if start_extra:
+                    extra = start_extra + "," + extra
+                boxes.append((start_step, step, extra))
+
+    for start_step, start_extra in starts:
+        add_diagnostic(diagnostics, start_step, "Start without an end")
+        boxes.append((start_step, trace_end, (start_extra + "," if start_extra else "") + "open"))
+
+    return boxes
+
+
+def plot_maple_stages(data, diagnostics=None):
     """Create a time-line plot over which stage is active. Potential extra comments for each stage is added as a label.
 
     Args:
         data (dict[int, list]): Output from format_atomic
+        diagnostics (list, optional): Collects unmatched starts and ends
     
     Returns:
         fig, ax: Matplotlib figure data
     """
+    from matplotlib.collections import PolyCollection
 
-    # From a list of (atomic) events, create a new list with the start and end steps for every phase
-    def create_boxes(data: list[tuple[int, str, str]]):
-        boxes: list[tuple[int, int, str]] = []
-        starts = []
-        for step, lifecycle, extra in data:
-            match lifecycle:
-                case "start":
-                    starts.append((step, extra))
-                case "end":
-                    start_step, start_extra = starts.pop()
-                    if start_extra:
-                        extra = start_extra + "," + extra
-                    boxes.append((start_step, step, extra))
-        # TODO: Handle cases without matching start and end
-        return boxes
+    plt = pyplot()
 
     # Map MAPLE category shorthands to the plot's y-values
     categories = {"m": 0, "a": 1, "p": 2, "l": 3, "e": 4}
 
+    all_steps = [step for events in data.values() for step, _, _ in events]
+    trace_start, trace_end = (min(all_steps), max(all_steps)) if all_steps else (0, 0)
+
     # Create polygons for each bar
     verts = []
     labels = []
     for k, v in data.items():
         y = categories[k]
 
-        for xfrom, xto, text in create_boxes(v):
+        for xfrom, xto, text in create_boxes(v, trace_start, trace_end, diagnostics):
             v = [
                 (xfrom, y - 0.4),
                 (xfrom, y + 0.4),
@@ -240,27 +366,68 @@ if __name__ == "__main__":
     atomic_parser.add_argument("-o", "--output", help="The output file", type=str)
     atomic_parser.set_defaults(cmd="atomic")
 
-    args = parser.parse_args()
+    loops_parser = subparsers.add_parser(
+        "loops", help="List the MAPLE loop iterations and stage transitions"
+    )
+    loops_parser.add_argument(
+        "-s", "--stream", help="The stage stream", type=str, default="stage"
+    )
+    loops_parser.set_defaults(cmd="loops")
 
-    with open(args.input) as f:
-        input_text = f.read()
+    args = parser.parse_args()
 
     match args.cmd:
         case "atomic":
-            plot = chain(
-                input_text,
-                parse,
-                format_atomic,
-                plot_maple_stages,
-                set_fig_title(args.input),
-            )
+            # Show the plot in a window if no output file is given
+            plt = pyplot(headless=bool(args.output))
+            diagnostics = []
+            with open(args.input) as f:
+                plot = chain(
+                    f,
+                    parse_lines,
+                    group_steps,
+                    lambda steps: format_atomic(steps, diagnostics),
+                    lambda data: plot_maple_stages(data, diagnostics),
+                    set_fig_title(args.input),
+                )
+            for step, message in diagnostics:
+                print(f"Step {step}: {message}", file=sys.stderr)
             out = args.output
             if out:
                 if "." not in out:
                     out = out + ".png"
                 save_fig(out)(plot)
             else:
-                # Show the plot in a windows if no output file is given
                 plt.show()
+        case "loops":
+            from maple_loops import (
+                format_loop_table,
+                format_transition_matrix,
+                loop_iterations,
+                loop_throughput,
+                transition_matrix,
+            )
+
+            from step_index import input_step_times
+
+            with open(args.input) as f:
+                streams = parse_rle(f.read())
+            if args.stream not in streams:
+                raise SystemExit(
+                    f"{args.input}: no stream {args.stream!r}, found {', '.join(streams) or 'none'}"
+                )
+            stream = streams[args.stream]
+            step_times = input_step_times(args.input, args.stream)
+            if step_times is not None and len(step_times) < stream.end_step:
+                print(f"{len(step_times)} step times for {stream.end_step} steps, ignoring them", file=sys.stderr)
+                step_times = None
+
+            table = loop_iterations(stream)
+            print(format_loop_table(table))
+            print()
+            print(format_transition_matrix(transition_matrix(stream)))
+            print()
+            for k, v in loop_throughput(table, step_times).items():
+                print(f"{k}: {v}")
         case _:
             parser.print_help()
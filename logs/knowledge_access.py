@@ -0,0 +1,189 @@
+#!/bin/env python3
+"""
+Analyze how the knowledge of the MAPLE-K loop is written and read in the k* experiments
+(kLaser, kDirections, kHandling, kIsLegit, kPlannedLidarMask).
+
+Each knowledge key is a stream of "read" and "write" events, in the LOLA input (kLaserScan)
+or echoed in the TWC output (kLaserScanEcho). For every read we find the write it observes,
+which gives without running the checker:
+
+    - missed writes: overwritten by the next write before anyone read them
+    - duplicate reads: a read of a value that was already read before
+    - staleness: steps (and seconds, if the step times are known) since the observed write
+
+Usage: python3 knowledge_access.py [run folder ...] [--source input|output]
+Without folders, all k* run folders in the current directory are analyzed.
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from rle import RLEStream
+
+READ = "read"
+WRITE = "write"
+
+
+def is_knowledge_stream(stream):
+    values = stream.values if isinstance(stream, RLEStream) else [v for _, v in stream]
+    return len(values) > 0 and set(np.unique(np.asarray(values, dtype=str)).tolist()) <= {READ, WRITE}
+
+
+def access_table(stream):
+    """Link every read of a knowledge stream to the write it observes.
+
+    Args:
+        stream (RLEStream | list[tuple[int, str]]): "read"/"write" events
+
+    Returns:
+        dict[str, np.ndarray]: For every event in order: step, is_write, and observed_write,
+            the index of the last write at or before the event (-1 if there was none)
+    """
+    if isinstance(stream, RLEStream):
+        lengths = stream.ends - stream.starts
+        run_of_event = np.repeat(np.arange(stream.n_runs), lengths)
+        # Position of every event inside its run
+        offsets = np.arange(len(run_of_event)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        steps = stream.starts[run_of_event] + offsets
+        is_write = np.asarray(stream.values == WRITE)[run_of_event]
+    else:
+        steps = np.array([s for s, _ in stream], dtype=np.int64)
+        is_write = np.array([v == WRITE for _, v in stream], dtype=bool)
+
+    index = np.arange(len(steps))
+    observed_write = np.maximum.accumulate(np.where(is_write, index, -1)) if len(steps) else index
+    return {"step": steps, "is_write": is_write, "observed_write": observed_write}
+
+
+def access_summary(table, step_times=None):
+    """Statistics of an access table.
+
+    Args:
+        table (dict[str, np.ndarray]): Output from access_table
+        step_times (np.ndarray, optional): Wall-clock time in seconds of every step, indexed by step
+
+    Returns:
+        dict: Counts of reads, writes, missed writes, duplicate reads and reads before the
+            first write, and the staleness of the reads in steps (and seconds)
+    """
+    steps = table["step"]
+    is_write = table["is_write"]
+    observed = table["observed_write"]
+
+    reads = ~is_write
+    write_idx = np.flatnonzero(is_write)
+    # Reads before each event, so the reads between two writes are a difference
+    reads_before = np.cumsum(reads) - reads
+    reads_after_write = np.r_[reads_before[write_idx[1:]], reads.sum()] - reads_before[write_idx]
+
+    read_idx = np.flatnonzero(reads & (observed >= 0))
+    read_writes = observed[read_idx]
+    duplicate = np.r_[False, read_writes[1:] == read_writes[:-1]] if len(read_writes) else read_writes
+
+    result = {
+        "events": len(steps),
+        "writes": len(write_idx),
+        "reads": int(reads.sum()),
+        "missed_writes": int((reads_after_write[:-1] == 0).sum()) if len(write_idx) else 0,
+        "last_write_unread": bool(len(write_idx) and reads_after_write[-1] == 0),
+        "duplicate_reads": int(duplicate.sum()),
+        "reads_before_first_write": int((reads & (observed < 0)).sum()),
+    }
+    if len(read_idx):
+        staleness = steps[read_idx] - steps[read_writes]
+        result["mean_staleness_steps"] = float(staleness.mean())
+        result["max_staleness_steps"] = int(staleness.max())
+        if step_times is not None:
+            staleness_s = step_times[steps[read_idx]] - step_times[steps[read_writes]]
+            result["mean_staleness_s"] = float(staleness_s.mean())
+            result["max_staleness_s"] = float(staleness_s.max())
+    return result
+
+
+def run_step_times(folder, stream_name):
+    """Wall-clock seconds of the steps of a knowledge stream of a run, from the step index
+    if there is one, otherwise from the publications in MAPE.log."""
+    from step_index import input_step_times
+
+    return input_step_times(os.path.join(folder, "MAPE.input"), stream_name)
+
+
+def analyze_run(folder, source="input"):
+    """Access statistics of every knowledge stream of a run.
+
+    Args:
+        folder (str): Run folder
+        source (str): "input" to read MAPE.input, "output" for the echo streams of TWC-output.txt
+
+    Returns:
+        dict[str, dict]: {knowledge key: access_summary}
+    """
+    if source == "input":
+        from input_parser import parse_rle
+
+        with open(os.path.join(folder, "MAPE.input")) as f:
+            streams = parse_rle(f.read())
+    else:
+        from twc_output import read_lola_output_rle
+
+        streams = read_lola_output_rle(os.path.join(folder, "TWC-output.txt"))
+
+    result = dict()
+    for name, stream in streams.items():
+        if not is_knowledge_stream(stream):
+            continue
+        key = name[:-len("Echo")] if name.endswith("Echo") else name
+        step_times = run_step_times(folder, key)
+        if step_times is not None and len(step_times) < stream.end_step:
+            step_times = None
+        result[key] = access_summary(access_table(stream), step_times)
+    return result
+
+
+def aggregate(summaries):
+    """Sum the counts and combine the staleness of several access summaries."""
+    counts = ["events", "writes", "reads", "missed_writes", "duplicate_reads", "reads_before_first_write"]
+    total = {k: sum(s[k] for s in summaries) for k in counts}
+    stale = [s for s in summaries if "mean_staleness_steps" in s]
+    if stale:
+        n_reads = [s["reads"] - s["reads_before_first_write"] for s in stale]
+        for unit in ["steps", "s"]:
+            if all(f"mean_staleness_{unit}" in s for s in stale):
+                total[f"mean_staleness_{unit}"] = float(
+                    np.average([s[f"mean_staleness_{unit}"] for s in stale], weights=n_reads)
+                )
+                total[f"max_staleness_{unit}"] = max(s[f"max_staleness_{unit}"] for s in stale)
+    return total
+
+
+def format_summary_table(rows):
+    columns = ["writes", "reads", "missed_writes", "duplicate_reads", "reads_before_first_write",
+               "mean_staleness_steps", "max_staleness_steps", "mean_staleness_s", "max_staleness_s"]
+    lines = ["run\tkey\t" + "\t".join(columns)]
+    for run, key, summary in rows:
+        values = []
+        for c in columns:
+            v = summary.get(c, "-")
+            values.append(f"{v:.3f}" if isinstance(v, float) else str(v))
+        lines.append(f"{run}\t{key}\t" + "\t".join(values))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze the knowledge reads and writes of k* runs")
+    parser.add_argument("folders", nargs="*", help="Run folders (default: all k* run folders here)")
+    parser.add_argument(
+        "--source", choices=["input", "output"], default="input",
+        help="Read the knowledge streams from MAPE.input or their echoes from TWC-output.txt",
+    )
+    args = parser.parse_args()
+    folders = args.folders or sorted(p for p in glob.glob("k*_*") if os.path.isdir(p))
+
+    rows = []
+    for folder in folders:
+        for key, summary in analyze_run(folder, args.source).items():
+            rows.append((os.path.basename(os.path.normpath(folder)), key, summary))
+    rows.append(("all", "-", aggregate([s for _, _, s in rows])))
+    print(format_summary_table(rows))
@@ -1,43 +1,57 @@
-import datetime as dt
-import re
+import os
 import sys
 
-timestamp_format = "%Y-%m-%d %H:%M:%S,%f"
+from lola_spec import read_spec
+from mape_log import iter_publications
+from step_index import index_path, to_epoch_us, write_step_index
 
-t0 = None
 
-if len(sys.argv) < 4:
-    raise RuntimeError(f'Usage: python3 {sys.argv[0]} [MAPE log file] [output lola file] [stream name to watch]')
+def write_lola(publications, outfile):
+    """Write publications as a LOLA input file, one step per value in the given order, and the
+    step index next to it.
 
-infile = sys.argv[1]
-outfile = sys.argv[2]
-out_stream = sys.argv[3]
+    Args:
+        publications (Iterable[tuple[int, LogRecord, str, str]]): (byte offset, record, stream,
+            value) of every publication, e.g. from mape_log.iter_publications
 
-events = {}
+    Returns:
+        int: Number of steps written. Without any, neither file is written.
+    """
+    times = []
+    offsets = []
+    with open(outfile, 'w') as f:
+        for step, (offset, record, stream, value) in enumerate(publications):
+            f.write(f'{step}: {stream} = "{value}"\n')
+            times.append(to_epoch_us(record.timestamp))
+            offsets.append(offset)
 
-with open(infile, 'r') as f:
-    for line in f.readlines():
+    if not times:
+        os.remove(outfile)
+        return 0
+    write_step_index(index_path(outfile), times, offsets)
+    return len(times)
 
-        parts = line.split(' - ', 3)
-        timestamp = dt.datetime.strptime(parts[0], timestamp_format)
-        node = parts[1]
-        level = parts[2]
-        message = parts[3]
 
-        m = re.match(r'Published to MQTT topic (.+): {"Str": "(.+)"}', message)
-        if m:
-            stream = m.group(1)
-            value = m.group(2)
-            if stream not in events:
-                events[stream] = []
-            events[stream].append(value)
+def convert(log_path, streams, outfile):
+    """`write_lola` of the values published on `streams` in a MAPE log. Only the publications
+    on `streams` are decoded.
 
-if not out_stream in events:
-    raise RuntimeError(f'No events found on "{out_stream}"')
+    Raises:
+        RuntimeError: Nothing was published on any of the streams
+    """
+    if not write_lola(iter_publications(log_path, set(streams)), outfile):
+        raise RuntimeError(f'No events found on {", ".join(map(repr, streams))}')
 
-with open(outfile, 'w') as f:
-    step = 0
 
-    for value in events[out_stream]:
-        f.write(f'{step}: {out_stream} = "{value}"\n')
-        step += 1
\ No newline at end of file
+def watched_streams(arg):
+    """The streams to watch: the input streams of a LOLA spec file, or a single stream name."""
+    if arg.endswith('.lola') or os.path.isfile(arg):
+        return list(read_spec(arg).inputs)
+    return [arg]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        raise RuntimeError(f'Usage: python3 {sys.argv[0]} [MAPE log file] [output lola file] [stream name to watch | spec file]')
+
+    convert(sys.argv[1], watched_streams(sys.argv[3]), sys.argv[2])
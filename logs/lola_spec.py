@@ -0,0 +1,58 @@
+#!/bin/env python3
+"""
+Reading the stream declarations of a LOLA spec as given to the trustworthiness checker:
+
+    in stage: Str
+    out maple: Bool
+    aux seen
+    maple = ...
+
+The input streams are the MQTT topics log_to_lola.py has to extract from MAPE.log, the output
+streams are the streams of the TWC output worth parsing. Passing them down to the readers means
+only the needed lines of both files are decoded.
+
+Usage: python3 lola_spec.py [spec file]
+"""
+import re
+import sys
+from typing import NamedTuple
+
+COMMENT_PATTERN = re.compile(r"//.*$")
+DECLARATION_PATTERN = re.compile(r"^\s*(in|out|aux)\s+([A-Za-z_][A-Za-z0-9_]*)\s*(?::\s*([^=]+?))?\s*(?:=.*)?$")
+
+
+class LolaSpec(NamedTuple):
+    inputs: dict
+    """{stream name: type name or None}, in order of declaration"""
+    outputs: dict
+    aux: dict
+
+
+def parse_spec(text: str):
+    """Collect the declared streams of a LOLA spec. Definitions are not parsed.
+
+    Returns:
+        LolaSpec: The declared input, output and auxiliary streams
+    """
+    declarations = {"in": dict(), "out": dict(), "aux": dict()}
+    for line in text.splitlines():
+        m = DECLARATION_PATTERN.match(COMMENT_PATTERN.sub("", line))
+        if m:
+            kind, name, type_name = m.groups()
+            declarations[kind][name] = type_name
+    return LolaSpec(declarations["in"], declarations["out"], declarations["aux"])
+
+
+def read_spec(path):
+    with open(path) as f:
+        return parse_spec(f.read())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise RuntimeError(f"Usage: python3 {sys.argv[0]} [spec file]")
+
+    spec = read_spec(sys.argv[1])
+    for kind, streams in zip(["in", "out", "aux"], spec):
+        for name, type_name in streams.items():
+            print(f"{kind} {name}" + (f": {type_name}" if type_name else ""))
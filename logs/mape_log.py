@@ -0,0 +1,135 @@
+"""
+Reading the MAPE.log files written by the MAPLE-K loop of the managed system.
+
+Every line has the form "timestamp - node - level - message".
+"""
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+
+PUBLISH_PREFIX = "Published to MQTT topic "
+PUBLISH_PATTERN = re.compile(r'Published to MQTT topic (.+): {"Str": "(.+)"}')
+
+
+class LogRecord(NamedTuple):
+    timestamp: datetime
+    node: str
+    level: str
+    message: str
+
+
+def parse_log_line(line: str):
+    parts = line.rstrip("\n").split(" - ", 3)
+    timestamp = datetime.strptime(parts[0], TIMESTAMP_FORMAT)
+    return LogRecord(timestamp, parts[1], parts[2], parts[3])
+
+
+def read_mape_log(path):
+    """Read all records of a MAPE log.
+
+    Returns:
+        list[LogRecord]: Records in the order of the file
+    """
+    with open(path, "r") as f:
+        return [parse_log_line(line) for line in f]
+
+
+def iter_log_offsets(path):
+    """Iterate over the records of a MAPE log together with the byte offset of their line.
+
+    Yields:
+        tuple[int, LogRecord]: (offset, record)
+    """
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            yield offset, parse_log_line(line.decode())
+            offset += len(line)
+
+
+def published_events(records, topics=None):
+    """Collect the string values published on every MQTT topic.
+
+    Args:
+        records (Iterable[LogRecord]): Records of a MAPE log
+        topics (Collection[str], optional): Only collect these topics
+
+    Returns:
+        dict[str, list[str]]: {topic: [value, ...]} in order of publication
+    """
+    events = {}
+    for record in records:
+        m = PUBLISH_PATTERN.match(record.message)
+        if m and (topics is None or m.group(1) in topics):
+            stream = m.group(1)
+            value = m.group(2)
+            if stream not in events:
+                events[stream] = []
+            events[stream].append(value)
+    return events
+
+
+def parse_publication(line: str, topics=None):
+    """(topic, value) of a raw log line publishing a string value, or None. Lines that do not
+    publish on one of `topics` are rejected without parsing their timestamp."""
+    if PUBLISH_PREFIX not in line:
+        return None
+    # A truncated line, e.g. the last one of a killed run, may lack the leading fields
+    parts = line.rstrip("\n").split(" - ", 3)
+    if len(parts) < 4:
+        return None
+    m = PUBLISH_PATTERN.match(parts[3])
+    if m is None or (topics is not None and m.group(1) not in topics):
+        return None
+    return m.group(1), m.group(2)
+
+
+def iter_publications(path, topics=None):
+    """Iterate over the values published on `topics` (all topics if None) in log order.
+    Only the publishing lines are decoded into records.
+
+    Yields:
+        tuple[int, LogRecord, str, str]: (byte offset of the line, record, topic, value)
+    """
+    with open(path, "rb") as f:
+        yield from line_publications(f, topics)
+
+
+def line_publications(lines, topics=None, offset=0):
+    """`iter_publications` of raw log lines (bytes or str), the first one starting at byte `offset`."""
+    for line in lines:
+        if isinstance(line, bytes):
+            size, line = len(line), line.decode()
+        else:
+            size = len(line.encode())
+        publication = parse_publication(line, topics)
+        if publication:
+            yield offset, parse_log_line(line), *publication
+        offset += size
+
+
+def select_publications(offset_records, topics=None):
+    """The publications among (offset, record) pairs from `iter_log_offsets`, in the form of
+    `iter_publications`."""
+    for offset, record in offset_records:
+        m = PUBLISH_PATTERN.match(record.message)
+        if m and (topics is None or m.group(1) in topics):
+            yield offset, record, m.group(1), m.group(2)
+
+
+def collect_publications(lines, topics=None):
+    """`published_events` of raw log lines, without parsing the lines that publish nothing."""
+    events = {}
+    for line in lines:
+        publication = parse_publication(line, topics)
+        if publication:
+            events.setdefault(publication[0], []).append(publication[1])
+    return events
+
+
+def read_published_events(path, topics=None):
+    """`published_events(read_mape_log(path), topics)` without parsing the other lines."""
+    with open(path, "r") as f:
+        return collect_publications(f, topics)
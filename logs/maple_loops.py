@@ -0,0 +1,198 @@
+"""
+Segment MAPLE stage streams into loop iterations.
+
+Works on the stage streams of both the LOLA input and the TWC output (`stage`, `stage2`,
+`atomicstage`, `stageout`, `s`). Values are either a plain stage ("m", "aok", "anom") or a
+lifecycle event of a stage ("start_m", "end_aok"). Values not naming a MAPLE stage, like
+the "start"/"end" events of the phase-write tests, are ignored.
+"""
+import re
+
+import numpy as np
+
+from rle import RLEStream
+
+
+STAGES = "maple"
+STAGE_PATTERN = re.compile(r"(?:(start|end)_)?([maple])(ok|nom)?")
+
+NO_STAGE = -1
+# Anomaly flag of an event or iteration
+ANOMALY_UNKNOWN = -1
+ANOMALY_OK = 0
+ANOMALY_FOUND = 1
+
+
+def encode_stages(values):
+    """Encode stage values as integer arrays. Only the distinct values are matched against
+    the stage pattern, so the cost is linear in the number of events.
+
+    Args:
+        values (Sequence[str]): Stage values
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Stage code (index in "maple", -1 if the value
+            is not a stage), whether the event enters the stage (start or plain stage) and the
+            anomaly flag of the event
+    """
+    uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+
+    codes = np.full(len(uniques), NO_STAGE, dtype=np.int8)
+    entering = np.zeros(len(uniques), dtype=bool)
+    anomaly = np.full(len(uniques), ANOMALY_UNKNOWN, dtype=np.int8)
+    for i, value in enumerate(uniques):
+        m = STAGE_PATTERN.fullmatch(value)
+        if m is None:
+            continue
+        lifecycle, stage, extra = m.groups()
+        codes[i] = STAGES.index(stage)
+        entering[i] = lifecycle != "end"
+        if extra:
+            anomaly[i] = ANOMALY_FOUND if extra == "nom" else ANOMALY_OK
+
+    return codes[inverse], entering[inverse], anomaly[inverse]
+
+
+def stage_events(stream):
+    """Steps and values of a stage stream.
+
+    For an RLEStream every run counts as one event, as a stage held over several steps is
+    still the same stage.
+
+    Args:
+        stream (RLEStream | list[tuple[int, str]]): Stage stream
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: steps, values
+    """
+    if isinstance(stream, RLEStream):
+        return stream.starts, stream.values
+    steps = np.fromiter((v[0] for v in stream), dtype=np.int64, count=len(stream))
+    values = np.array([v[1] for v in stream], dtype=str)
+    return steps, values
+
+
+def loop_iterations(stream):
+    """Split a stage stream into MAPLE loop iterations. A new iteration starts whenever the
+    Monitor stage is entered; events before the first Monitor stage are dropped.
+
+    Args:
+        stream (RLEStream | list[tuple[int, str]]): Stage stream
+
+    Returns:
+        dict[str, np.ndarray]: Columns of the iteration table:
+            iteration: Iteration number
+            start_step, end_step: Step of the first and last event of the iteration
+            stages: Bit mask of the stages seen, bit i set for stage STAGES[i]
+            anomaly: ANOMALY_FOUND/ANOMALY_OK if the analysis reported an anomaly or not,
+                ANOMALY_UNKNOWN if the stream does not say
+            abandoned: The loop went towards planning (anomaly found, plan or legitimate
+                stage seen) but never reached the execute stage
+    """
+    steps, values = stage_events(stream)
+    codes, entering, anomaly = encode_stages(values)
+
+    is_stage = codes != NO_STAGE
+    steps, codes, entering, anomaly = steps[is_stage], codes[is_stage], entering[is_stage], anomaly[is_stage]
+
+    iteration_start = (codes == 0) & entering
+    first = np.flatnonzero(iteration_start)
+    if len(first) == 0:
+        return {
+            "iteration": np.empty(0, dtype=np.int64),
+            "start_step": np.empty(0, dtype=np.int64),
+            "end_step": np.empty(0, dtype=np.int64),
+            "stages": np.empty(0, dtype=np.int8),
+            "anomaly": np.empty(0, dtype=np.int8),
+            "abandoned": np.empty(0, dtype=bool),
+        }
+    last = np.r_[first[1:] - 1, len(codes) - 1]
+
+    stages = np.bitwise_or.reduceat((1 << codes.astype(np.int16)).astype(np.int8), first)
+    anomaly = np.maximum.reduceat(anomaly, first)
+
+    bit = {s: 1 << i for i, s in enumerate(STAGES)}
+    towards_plan = (anomaly == ANOMALY_FOUND) | ((stages & (bit["p"] | bit["l"])) != 0)
+    abandoned = towards_plan & ((stages & bit["e"]) == 0)
+
+    return {
+        "iteration": np.arange(len(first)),
+        "start_step": steps[first],
+        "end_step": steps[last],
+        "stages": stages,
+        "anomaly": anomaly,
+        "abandoned": abandoned,
+    }
+
+
+def transition_matrix(stream):
+    """Count transitions between consecutively entered stages.
+
+    Args:
+        stream (RLEStream | list[tuple[int, str]]): Stage stream
+
+    Returns:
+        np.ndarray: 5x5 matrix where [i, j] counts entering STAGES[j] right after STAGES[i]
+    """
+    _, values = stage_events(stream)
+    codes, entering, _ = encode_stages(values)
+    entered = codes[(codes != NO_STAGE) & entering].astype(np.int64)
+
+    n = len(STAGES)
+    counts = np.bincount(entered[:-1] * n + entered[1:], minlength=n * n)
+    return counts.reshape(n, n)
+
+
+def loop_throughput(table, step_times=None):
+    """Iteration-level throughput of a loop table.
+
+    Args:
+        table (dict[str, np.ndarray]): Output from loop_iterations
+        step_times (np.ndarray, optional): Wall-clock time in seconds of every step, indexed by step.
+            Without it, throughput is only reported per step.
+
+    Returns:
+        dict: Number of iterations, abandoned iterations and loops per step (and per second)
+    """
+    n = len(table["iteration"])
+    result = {
+        "iterations": n,
+        "abandoned": int(table["abandoned"].sum()),
+        "anomalies": int((table["anomaly"] == ANOMALY_FOUND).sum()),
+    }
+    if n == 0:
+        return result
+
+    span_steps = table["end_step"][-1] - table["start_step"][0]
+    result["loops_per_step"] = float(n / span_steps) if span_steps else float("nan")
+
+    if step_times is not None:
+        starts = step_times[table["start_step"]]
+        ends = step_times[table["end_step"]]
+        span = ends[-1] - starts[0]
+        result["loops_per_second"] = float(n / span) if span else float("nan")
+        result["mean_duration_s"] = float(np.mean(ends - starts))
+
+    return result
+
+
+def stage_names(mask):
+    """Stages of an iteration bit mask as a string, e.g. "ma" or "maple"."""
+    return "".join(s for i, s in enumerate(STAGES) if mask & (1 << i))
+
+
+def format_loop_table(table):
+    anomaly_names = {ANOMALY_UNKNOWN: "-", ANOMALY_OK: "ok", ANOMALY_FOUND: "anom"}
+    lines = ["iteration\tstart\tend\tstages\tanomaly\tabandoned"]
+    for i, start, end, stages, anomaly, abandoned in zip(
+        *(table[k].tolist() for k in ["iteration", "start_step", "end_step", "stages", "anomaly", "abandoned"])
+    ):
+        lines.append(f"{i}\t{start}\t{end}\t{stage_names(stages)}\t{anomaly_names[anomaly]}\t{abandoned}")
+    return "\n".join(lines)
+
+
+def format_transition_matrix(matrix):
+    lines = ["\t" + "\t".join(STAGES)]
+    for s, row in zip(STAGES, matrix.tolist()):
+        lines.append(s + "\t" + "\t".join(str(v) for v in row))
+    return "\n".join(lines)
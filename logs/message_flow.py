@@ -0,0 +1,263 @@
+#!/bin/env python3
+"""
+Trace MQTT messages from their publication to every node receiving them.
+
+Every "Published to MQTT topic T: payload" record of a MAPE log is matched with the
+"Received MQTT message: payload on topic: T" records of all subscribers. Publications are
+indexed by topic and a short hash of the payload, so the LiDAR scans and spin configs are
+never kept in memory. A node receives the publications of one topic and payload in order,
+so a receive is matched with the oldest publication the node has not received yet.
+
+From the matched deliveries we get the delivery latency per topic and receiver, the number
+of messages in flight over time, and the lag of the runtime verification node
+(Trustworthiness) behind the nodes of the managed system.
+
+Usage: python3 message_flow.py [MAPE log file] [output plot.png]
+"""
+import hashlib
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from mape_log import read_mape_log
+
+PUBLISH_ANY_PATTERN = re.compile(r"Published to MQTT topic ([^:]+): (.*)$")
+RECEIVE_PATTERN = re.compile(r"Received MQTT message: (.*) on topic: (\S+)$")
+
+MONITOR_NODE = "Trustworthiness"
+
+DELIVERY_COLUMNS = ["publish_id", "topic", "publisher", "receiver", "published", "received"]
+
+
+def payload_key(topic, payload):
+    """Index key of a message: the topic and an 8 byte hash of the payload."""
+    return topic, hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+
+def trace_message_flow(records):
+    """Match every received message with its publication.
+
+    Args:
+        records (Iterable[LogRecord]): Output from mape_log.read_mape_log
+
+    Returns:
+        tuple[dict[str, np.ndarray], dict[str, dict[str, int]]]: The deliveries as columns
+            (see DELIVERY_COLUMNS, times in seconds since the epoch) and per topic the number
+            of receives without a publication (e.g. /Scan, published outside the log) and of
+            publications nobody received
+    """
+    # Publication times and ids per message key, and how many of them every receiver has consumed
+    published = defaultdict(list)
+    consumed = defaultdict(int)
+    delivered = set()
+    publications = []
+    unmatched = defaultdict(lambda: {"receives": 0, "publishes": 0})
+
+    columns = {k: [] for k in DELIVERY_COLUMNS}
+
+    for timestamp, node, level, message in records:
+        if message.startswith("Published"):
+            m = PUBLISH_ANY_PATTERN.match(message)
+            if not m:
+                continue
+            topic, payload = m.groups()
+            publish_id = len(publications)
+            publications.append((topic, node))
+            published[payload_key(topic, payload)].append((timestamp.timestamp(), publish_id))
+        elif message.startswith("Received"):
+            m = RECEIVE_PATTERN.match(message)
+            if not m:
+                continue
+            payload, topic = m.groups()
+            key = payload_key(topic, payload)
+            queue = published.get(key, [])
+            i = consumed[key, node]
+            received = timestamp.timestamp()
+            if i >= len(queue) or queue[i][0] > received:
+                unmatched[topic]["receives"] += 1
+                continue
+            consumed[key, node] = i + 1
+
+            publish_time, publish_id = queue[i]
+            delivered.add(publish_id)
+            columns["publish_id"].append(publish_id)
+            columns["topic"].append(topic)
+            columns["publisher"].append(publications[publish_id][1])
+            columns["receiver"].append(node)
+            columns["published"].append(publish_time)
+            columns["received"].append(received)
+
+    for publish_id, (topic, node) in enumerate(publications):
+        if publish_id not in delivered:
+            unmatched[topic]["publishes"] += 1
+
+    deliveries = {
+        "publish_id": np.array(columns["publish_id"], dtype=np.int64),
+        "topic": np.array(columns["topic"], dtype=str),
+        "publisher": np.array(columns["publisher"], dtype=str),
+        "receiver": np.array(columns["receiver"], dtype=str),
+        "published": np.array(columns["published"], dtype=np.float64),
+        "received": np.array(columns["received"], dtype=np.float64),
+    }
+    return deliveries, dict(unmatched)
+
+
+def latency_stats(latencies):
+    """Count, mean and percentiles of latencies given in seconds, in milliseconds."""
+    ms = np.asarray(latencies) * 1000
+    if len(ms) == 0:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def delivery_latencies(deliveries):
+    """Latency distribution of every topic and receiver.
+
+    Returns:
+        dict[tuple[str, str], dict]: {(topic, receiver): latency_stats}
+    """
+    latency = deliveries["received"] - deliveries["published"]
+    groups = defaultdict(list)
+    for i, pair in enumerate(zip(deliveries["topic"].tolist(), deliveries["receiver"].tolist())):
+        groups[pair].append(i)
+    return {pair: latency_stats(latency[indices]) for pair, indices in groups.items()}
+
+
+def in_flight_depth(deliveries, receiver=None):
+    """Number of messages published but not yet received over time.
+
+    Args:
+        deliveries (dict[str, np.ndarray]): Output from trace_message_flow
+        receiver (str, optional): Only count deliveries to this node
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Times in seconds and the depth from that time on
+    """
+    mask = slice(None) if receiver is None else deliveries["receiver"] == receiver
+    starts = deliveries["published"][mask]
+    ends = deliveries["received"][mask]
+
+    times = np.concatenate([starts, ends])
+    change = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)])
+    # Publications sort before receives at the same time, so the depth never drops below zero.
+    # Timestamps only have millisecond resolution, so a delivery within the same millisecond
+    # still counts as in flight for that instant.
+    order = np.lexsort((-change, times))
+    return times[order], np.cumsum(change[order])
+
+
+def monitor_lag(deliveries, node=MONITOR_NODE):
+    """How much later `node` receives a message than the first other node receiving it.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Publication times and the lag in seconds, for every
+            publication received both by `node` and by another node
+    """
+    is_node = deliveries["receiver"] == node
+    ids = deliveries["publish_id"]
+
+    first_other = {}
+    for publish_id, received in zip(ids[~is_node].tolist(), deliveries["received"][~is_node].tolist()):
+        if publish_id not in first_other or received < first_other[publish_id]:
+            first_other[publish_id] = received
+
+    both = np.array([i in first_other for i in ids[is_node].tolist()], dtype=bool)
+    node_ids = ids[is_node][both]
+    other = np.array([first_other[i] for i in node_ids.tolist()], dtype=np.float64)
+    return deliveries["published"][is_node][both], deliveries["received"][is_node][both] - other
+
+
+def format_latency_table(latencies):
+    lines = ["topic\treceiver\tcount\tmean_ms\tp50_ms\tp90_ms\tp99_ms\tmax_ms"]
+    for (topic, receiver), s in sorted(latencies.items()):
+        if s["count"] == 0:
+            continue
+        lines.append(
+            f"{topic}\t{receiver}\t{s['count']}\t{s['mean_ms']:.1f}\t{s['p50_ms']:.1f}"
+            f"\t{s['p90_ms']:.1f}\t{s['p99_ms']:.1f}\t{s['max_ms']:.1f}"
+        )
+    return "\n".join(lines)
+
+
+def flow_report(deliveries, unmatched, node=MONITOR_NODE):
+    """Text report of the latencies, in-flight depth and monitor lag of a traced log."""
+    lines = [format_latency_table(delivery_latencies(deliveries)), ""]
+
+    for receiver in [None, node]:
+        times, depth = in_flight_depth(deliveries, receiver)
+        if len(depth):
+            span = times[-1] - times[0]
+            # Time-weighted mean of the step function
+            mean = float(np.sum(depth[:-1] * np.diff(times)) / span) if span else 0.0
+            lines.append(f"in flight{' to ' + receiver if receiver else ''}: max {depth.max()}, mean {mean:.3f}")
+
+    _, lag = monitor_lag(deliveries, node)
+    stats = latency_stats(lag)
+    if stats["count"]:
+        lines.append(
+            f"{node} lag: {stats['count']} messages, mean {stats['mean_ms']:.1f} ms, "
+            f"p90 {stats['p90_ms']:.1f} ms, max {stats['max_ms']:.1f} ms"
+        )
+
+    # Publications on topics nobody subscribed to (the knowledge and stage streams) are not reported
+    subscribed = set(deliveries["topic"].tolist())
+    for topic, counts in sorted(unmatched.items()):
+        if counts["receives"] or topic in subscribed:
+            lines.append(f"unmatched {topic}: {counts['receives']} receives, {counts['publishes']} publications")
+    return "\n".join(lines)
+
+
+def plot_message_flow(deliveries, outfile, node=MONITOR_NODE):
+    """Latency per topic, in-flight depth and monitor lag over time in one figure."""
+    from plotting import pyplot
+
+    plt = pyplot()
+
+    fig, (ax_latency, ax_depth, ax_lag) = plt.subplots(3, 1, figsize=[10, 10])
+    t0 = deliveries["published"].min() if len(deliveries["published"]) else 0
+
+    latency = (deliveries["received"] - deliveries["published"]) * 1000
+    labels = sorted(set(zip(deliveries["topic"].tolist(), deliveries["receiver"].tolist())))
+    for y, (topic, receiver) in enumerate(labels):
+        mask = (deliveries["topic"] == topic) & (deliveries["receiver"] == receiver)
+        ax_latency.plot(latency[mask], np.full(mask.sum(), y), "|", markersize=8)
+    ax_latency.set_yticks(range(len(labels)))
+    ax_latency.set_yticklabels([f"{t} → {r}" for t, r in labels], fontsize=7)
+    ax_latency.set_xlabel("Delivery latency [ms]")
+
+    for receiver, label in [(None, "all receivers"), (node, node)]:
+        times, depth = in_flight_depth(deliveries, receiver)
+        ax_depth.step(times - t0, depth, where="post", label=label)
+    ax_depth.set_ylabel("Messages in flight")
+    ax_depth.legend()
+
+    published, lag = monitor_lag(deliveries, node)
+    ax_lag.plot(published - t0, lag * 1000, ".", markersize=3)
+    ax_lag.set_ylabel(f"{node} lag [ms]")
+    ax_lag.set_xlabel("Time [s]")
+
+    for ax in (ax_latency, ax_depth, ax_lag):
+        ax.grid()
+    fig.tight_layout()
+    fig.savefig(outfile)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise RuntimeError(f"Usage: python3 {sys.argv[0]} [MAPE log file] [output plot.png]")
+
+    deliveries, unmatched = trace_message_flow(read_mape_log(sys.argv[1]))
+    print(flow_report(deliveries, unmatched))
+    if len(sys.argv) > 2:
+        plot_message_flow(deliveries, sys.argv[2])
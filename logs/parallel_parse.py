@@ -0,0 +1,142 @@
+"""
+Parallel parsing of a single large MAPE.log or TWC output.
+
+The file is split into byte ranges that start and end on line boundaries. Every range is
+parsed by a worker process, which maps the file into memory and only decodes its own range,
+so no file contents are sent between processes. The per-chunk results are merged in file order:
+
+    - published values are appended topic by topic, publications with their byte offsets
+      are concatenated,
+    - timing events are concatenated; pairing of start and end events happens afterwards
+      in `plot_timing`, so a loop stage starting in one chunk and ending in the next is kept,
+    - TWC output streams are joined run by run with `concatenate_rle`.
+
+Files smaller than `MIN_CHUNK_BYTES` per worker are parsed in the calling process.
+"""
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from mape_log import collect_publications, line_publications, parse_log_line
+from plot_log_timing import sort_maple, timing_events
+from rle import concatenate_rle
+from twc_output import collect_output_rle
+
+MIN_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def line_aligned_ranges(path, n_chunks):
+    """Split a file into at most `n_chunks` byte ranges of about equal size.
+    Every range except the last ends directly after a newline.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) byte offsets, the end is exclusive
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n_chunks):
+            target = max(size * i // n_chunks, bounds[-1])
+            if target >= size:
+                break
+            # Reading the rest of the line containing the byte before the target
+            # moves to the start of the next line, or stays if the target already is one
+            f.seek(target - 1)
+            f.readline()
+            offset = f.tell()
+            if offset >= size:
+                break
+            if offset > bounds[-1]:
+                bounds.append(offset)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_chunk(path, start, end, func, offsets=False):
+    """Apply `func` to the lines between the byte offsets `start` and `end` of a file, and with
+    `offsets` to `start` as well."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        text = m[start:end].decode()
+    lines = text.splitlines(keepends=True)
+    return func(lines, start) if offsets else func(lines)
+
+
+def map_line_chunks(path, func, workers=None, offsets=False):
+    """Parse a file chunk by chunk in a process pool.
+
+    Args:
+        path (str): The file to parse
+        func (Callable[[list[str]], T]): Parses the lines of one chunk. Must be picklable,
+            i.e. a module level function or a `functools.partial` of one.
+        workers (int, optional): Number of processes, defaults to the number of CPUs
+        offsets (bool): Call `func(lines, offset)` with the byte offset of the first line
+
+    Returns:
+        list[T]: The results of `func` for every chunk, in file order
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    workers = max(1, min(workers, size // MIN_CHUNK_BYTES))
+    ranges = line_aligned_ranges(path, workers)
+
+    if workers == 1:
+        return [parse_chunk(path, start, end, func, offsets) for start, end in ranges]
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(parse_chunk, path, start, end, func, offsets) for start, end in ranges]
+        return [future.result() for future in futures]
+
+
+def _timing_chunk(lines):
+    return timing_events(parse_log_line(line) for line in lines)
+
+
+def published_events_parallel(path, workers=None, topics=None):
+    """Parallel version of `mape_log.read_published_events`."""
+    events = {}
+    for chunk in map_line_chunks(path, partial(collect_publications, topics=topics), workers):
+        for topic, values in chunk.items():
+            events.setdefault(topic, []).extend(values)
+    return events
+
+
+def _publications_chunk(lines, offset, topics=None):
+    return list(line_publications(lines, topics, offset))
+
+
+def publications_parallel(path, workers=None, topics=None):
+    """Parallel version of `mape_log.iter_publications`, as a list."""
+    publications = []
+    for chunk in map_line_chunks(path, partial(_publications_chunk, topics=topics), workers, offsets=True):
+        publications.extend(chunk)
+    return publications
+
+
+def timing_events_parallel(path, workers=None):
+    """Parallel version of `plot_log_timing.read_timing_events`."""
+    events = []
+    observed_nodes = set()
+    for chunk_events, chunk_nodes in map_line_chunks(path, _timing_chunk, workers):
+        events.extend(chunk_events)
+        observed_nodes.update(chunk_nodes)
+
+    observed_nodes = list(observed_nodes)
+    observed_nodes.sort(key=sort_maple, reverse=True)
+    return events, observed_nodes
+
+
+def read_lola_output_rle_parallel(path, streams: list = None, workers=None):
+    """Parallel version of `twc_output.read_lola_output_rle`."""
+    chunks = map_line_chunks(path, partial(collect_output_rle, streams=streams), workers)
+
+    merged = {}
+    for chunk in chunks:
+        for name, stream in chunk.items():
+            merged.setdefault(name, []).append(stream)
+    if streams is not None:
+        merged = {name: merged[name] for name in streams if name in merged}
+    return {name: concatenate_rle(parts) for name, parts in merged.items()}
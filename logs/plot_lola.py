@@ -1,85 +1,314 @@
-import matplotlib.pyplot as plt
+import numpy as np
+import os
 import re
+from collections import deque
+from typing import NamedTuple
+
+from input_parser import add_diagnostic
+from plotting import pyplot
+from rle import RLEStream, zero_index_rle
+from step_index import load_step_index
+from twc_output import (
+    read_lola_output,
+    read_lola_output_rle,
+    read_streams,
+    split_dict,
+    split_merged_stream,
+    zero_index,
+)
+
+plt = pyplot()
+
+
+# Artists of data with more points than this are rasterized, so the saved PDFs stay small.
+# It is compared with the number of points before decimation: after it, every artist has
+# only a few points per pixel column.
+RASTERIZE_THRESHOLD = 5000
+
+
+def axis_pixel_width(ax=plt):
+    """Width of the axes in display pixels, used as the number of decimation bins."""
+    if ax is plt:
+        ax = plt.gca()
+    return max(int(ax.get_window_extent().width), 1)
+
+
+def compress_runs(xs, ys):
+    """Collapse runs of identical values in a post-step series.
+
+    Only the steps where the value changes are kept, plus the last step so the
+    final run keeps its length.
+    """
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
+    if len(xs) < 3:
+        return xs, ys
+
+    keep = np.empty(len(ys), dtype=bool)
+    keep[0] = True
+    keep[1:] = ys[1:] != ys[:-1]
+    keep[-1] = True
+    return xs[keep], ys[keep]
+
+
+def decimate_minmax(xs, ys, n_bins):
+    """Per-pixel min/max decimation of a post-step series.
+
+    The x-range is split into `n_bins` bins. Every bin is reduced to a vertical
+    line spanning the min and max value inside it, followed by the last value of
+    the bin, so a single violating step is still drawn.
+    """
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
+    if len(xs) <= 4 * n_bins or xs[-1] == xs[0]:
+        return xs, ys
+
+    bins = ((xs - xs[0]) * (n_bins - 1) // (xs[-1] - xs[0])).astype(int)
+    first = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    last = np.r_[first[1:] - 1, len(xs) - 1]
+
+    out_x = np.column_stack([xs[first], xs[first], xs[first], xs[last]]).ravel()
+    out_y = np.column_stack([
+        ys[first],
+        np.minimum.reduceat(ys, first),
+        np.maximum.reduceat(ys, first),
+        ys[last],
+    ]).ravel()
+    return out_x, out_y
+
+
+def decimate_points(xs, n_bins):
+    """Keep one point per pixel bin of a scatter series that is drawn on a single line."""
+    xs = np.asarray(xs)
+    if len(xs) <= n_bins or xs.max() == xs.min():
+        return xs
+
+    bins = ((xs - xs.min()) * (n_bins - 1) // (xs.max() - xs.min())).astype(int)
+    _, idx = np.unique(bins, return_index=True)
+    return xs[idx]
+
+
+def plot_binary(steps, ax=plt, binary_range=(-1,1), max_points=None, through_end=False, **kwargs):
+    if isinstance(steps, RLEStream):
+        xs, values = steps.step_xy(through_end)
+        ys = np.where(values.astype(bool), binary_range[1], binary_range[0])
+    else:
+        xs = np.fromiter((v[0] for v in steps), dtype=np.int64, count=len(steps))
+        ys = np.fromiter((binary_range[1] if v[1] else binary_range[0] for v in steps), dtype=float, count=len(steps))
+        if through_end and len(xs):
+            xs, ys = np.r_[xs, xs[-1] + 1], np.r_[ys, ys[-1]]
 
-
-#%% 
-def read_lola_output(file, streams:list):
-    parsed = dict()
-
-    with open(file, 'r') as f:
-        for line in f.readlines():
-            pattern = r'([a-zA-Z][a-zA-Z0-9]*)\[(\d+)\] = (Bool\((false|true)\)|Str\("([^"]+)\"\)|Int\((\d+)\)|Float\((\d+\.\d+)\))\s+'
-            m = re.match(pattern, line)
-            if m:
-                stream_name, stream_idx, whole_value, bool_value, string_value, int_value, float_value = m.groups()
-                if stream_name in streams:
-                    v = None
-                    if whole_value.startswith('Bool'):
-                        v = bool_value == 'true'
-                    elif whole_value.startswith('Str'):
-                        v = string_value
-                    elif whole_value.startswith('Int'):
-                        v = int(int_value)
-                    elif whole_value.startswith('Float'):
-                        v = float(float_value)
-                    i = int(stream_idx)
-
-                    if not i in parsed:
-                        parsed[i] = dict()
-                    parsed[i][stream_name] = v
-    return parsed
-
-def zero_index(d:dict):
-    least_index = min(d.keys())
-    d_new = dict()
-    for k,v in d.items():
-        d_new[k-least_index] = v
-    return d_new
-
-def split_dict(d:dict):
-    values = dict()
-
-    for n,dv in d.items():
-        for k,v in dv.items():
-            if not k in values:
-                values[k] = []
-            values[k].append((n,v))
-    
-    return values
-
-
-def split_merged_stream(l: list[tuple]):
-    unmerged = dict()
-    for v in l:
-        if not v[1] in unmerged:
-            unmerged[v[1]] = []
-        unmerged[v[1]].append(v[0])
-    return unmerged
-
-
-def plot_binary(steps, ax=plt, binary_range=(-1,1), **kwargs):
-    xs = list(map(lambda v: v[0], steps))
-    ys = list(map(lambda v: binary_range[1] if v[1] else binary_range[0], steps))
+    xs, ys = compress_runs(xs, ys)
+    kwargs.setdefault('rasterized', len(xs) > RASTERIZE_THRESHOLD)
+    xs, ys = decimate_minmax(xs, ys, max_points or axis_pixel_width(ax))
 
     ax.step(xs, ys, where='post', **kwargs)
 
-def plot_stage(name, steps, ax=plt, color_map=None, **kwargs):
-    xs = steps
-    ys = [0] * len(steps)
+def plot_stage(name, steps, ax=plt, color_map=None, max_points=None, **kwargs):
+    kwargs.setdefault('rasterized', len(steps) > RASTERIZE_THRESHOLD)
+    xs = decimate_points(steps, max_points or axis_pixel_width(ax))
+    ys = np.zeros(len(xs))
 
     if color_map and name in color_map:
         ax.scatter(xs, ys, label=name, color=color_map[name], **kwargs)
     else:
         ax.scatter(xs, ys, label=name, **kwargs)
 
+def step_axis(ax, step_times=None):
+    """Label the x axis of a plot over time steps. With the wall-clock time of every step,
+    the axis is scaled to show seconds instead."""
+    from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+    if step_times is None:
+        ax.set_xlabel("Time step")
+        return
+
+    steps = np.arange(len(step_times))
+    # Several steps can share a millisecond timestamp, the mapping only has to be monotonic
+    times = np.maximum.accumulate(step_times - step_times[0])
+    to_time = lambda x: np.interp(x, steps, times)
+    to_step = lambda t: np.interp(t, times, steps)
+
+    class TimeLocator(MaxNLocator):
+        """Place ticks at round seconds instead of round steps."""
+        def tick_values(self, vmin, vmax):
+            return to_step(super().tick_values(to_time(vmin), to_time(vmax)))
+
+    ax.set_xscale('function', functions=(to_time, to_step))
+    ax.xaxis.set_major_locator(TimeLocator())
+    ax.xaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"{float(to_time(x)):g}"))
+    ax.set_xlabel("Time [s]")
+
 def plot_stages(stages, ax=plt, color_map=None, **kwargs):
     for k,v in stages.items():
         plot_stage(k, v, ax, color_map, **kwargs)
 
+def legend_below(ax, ncol, y=-.25):
+    ax.legend(loc='upper left', bbox_to_anchor=(-.1, y),
+            fancybox=True, shadow=True, ncol=ncol)
+
+
+# %% Figure templates
+FIGURE_TEMPLATES = dict()
+_template_figures = dict()
+
+def figure_template(name):
+    """Register the builder of a figure layout. It is called as `build(**layout)` and returns
+    `(fig, axes)`; everything it sets up is kept for all figures drawn with the layout.
+
+    The figures are not registered with pyplot, so they are freed by `close_templates`.
+    """
+    def register(build):
+        FIGURE_TEMPLATES[name] = build
+        return build
+    return register
+
+def clear_axes_data(ax):
+    """Remove what the previous figure drew on a template axes and reset its autoscaling."""
+    for container in list(ax.containers):
+        container.remove()
+    for artist in [*ax.lines, *ax.collections, *ax.patches, *ax.texts]:
+        artist.remove()
+    if ax.get_legend():
+        ax.get_legend().remove()
+    ax.set_title("")
+    if ax.get_xscale() != 'linear':
+        ax.set_xscale('linear')
+    ax.set_prop_cycle(None)
+    from matplotlib.transforms import Bbox
+    ax.dataLim.set_points(Bbox.null().get_points())
+    ax.ignore_existing_data_limits = True
+
+def template_figure(name, **layout):
+    """The figure and axes of a layout, built on first use and cleared for every later figure."""
+    key = (name, *sorted(layout.items()))
+    if key in _template_figures:
+        for ax in _template_figures[key][1]:
+            clear_axes_data(ax)
+    else:
+        _template_figures[key] = FIGURE_TEMPLATES[name](**layout)
+    return _template_figures[key]
+
+def close_templates():
+    _template_figures.clear()
+
+@figure_template('verdict')
+def verdict_layout(grid=True):
+    """A boolean verdict over time with the stages drawn on it and the legend below."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(9,2))
+    ax = fig.add_subplot()
+    if grid:
+        ax.grid(axis='x')
+    ax.set_axisbelow(True)
+    ax.set_yticks([-1, 1])
+    ax.set_yticklabels(['false', 'true'])
+    ax.set_ylim(-1.2,1.2)
 
+    # Shrink the axis's height by 40% on the bottom, to make room for the legend
+    box = ax.get_position()
+    ax.set_position([box.x0, box.y0 + box.height * 0.4,
+                    box.width, box.height * 0.6])
+    return fig, (ax,)
+
+@figure_template('atomic')
+def atomic_layout(title=False):
+    """Bars of the open loop stages with the boolean verdict on a twin axis."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(8,2))
+    ax = fig.add_subplot()
+    # The tight layout only depends on the height of the title, which is the same for any
+    # single line, so a placeholder reserves the space for the titles of all figures
+    if title:
+        ax.set_title("title")
+    fig.tight_layout()
 
+    ax.grid(axis='x')
+    ax.set_axisbelow(True)
 
-def create_maple_plot(streams, outfile, legend_ncol=5, title=None):
+    ax2 = ax.twinx()
+    ax2.set_ylabel("Atomic property\nevaluation")
+    return fig, (ax, ax2)
+
+
+PLOT_KINDS = dict()
+
+def plot_kind(name, streams):
+    """Register a plot kind.
+
+    The decorated function is called as `func(streams, outfile, **params)` with the
+    zero-indexed streams it declared. When the wall-clock time of the steps is known, it is
+    passed as `step_times` (seconds, indexed by zero-indexed step) for `step_axis`.
+
+    Args:
+        name (str): Name of the kind, as used in a PlotJob
+        streams (list | Callable[[dict], list]): Output streams the plot reads, or a function
+            returning them from the plot parameters
+    """
+    def register(func):
+        PLOT_KINDS[name] = (streams, func)
+        return func
+    return register
+
+class PlotJob(NamedTuple):
+    kind: str
+    folder: str
+    input_file: str = "TWC-output-window.txt"
+    output_file: str = "TWC-output-window.pdf"
+    params: dict = dict()
+
+def required_streams(job: PlotJob):
+    streams, _ = PLOT_KINDS[job.kind]
+    if callable(streams):
+        return streams(job.params)
+    return streams
+
+def render_batch(jobs: list[PlotJob], read=read_lola_output_rle, step_index=None):
+    """Render a list of figures. Every input file is parsed once, for the union of the
+    streams needed by all figures reading it, and the result is shared between them.
+
+    Args:
+        jobs (list[PlotJob]): Figures to render
+        read (Callable[[str, set], dict], optional): Reads the streams of an input file, e.g. from a cache
+        step_index (Callable[[str], StepIndex | None], optional): Returns the step index of an input
+            file. If given, figures with an index get a wall-clock x axis.
+    """
+    by_input = dict()
+    for job in jobs:
+        by_input.setdefault(os.path.join(job.folder, job.input_file), []).append(job)
+
+    for path, file_jobs in by_input.items():
+        needed = set()
+        for job in file_jobs:
+            needed.update(required_streams(job))
+        parsed = read(path, needed)
+        index = step_index(path) if step_index else None
+
+        for job in file_jobs:
+            _, draw = PLOT_KINDS[job.kind]
+            subset = {k: parsed[k] for k in required_streams(job) if k in parsed}
+            params = dict(job.params)
+            if index is not None and len(index):
+                first_step = min((s.first_step for s in subset.values() if s.n_runs), default=0)
+                params['step_times'] = index.step_times()[first_step:]
+            draw(zero_index_rle(subset), os.path.join(job.folder, job.output_file), **params)
+    close_templates()
+
+def input_step_index(path):
+    """Step index of the MAPE.input next to a TWC output, for `render_batch`."""
+    return load_step_index(os.path.join(os.path.dirname(path), "MAPE.input"))
+
+def render_one(kind, folder, input_file=None, output_file=None, **params):
+    files = dict()
+    if input_file:
+        files['input_file'] = input_file
+    if output_file:
+        files['output_file'] = output_file
+    render_batch([PlotJob(kind, folder, params=params, **files)])
+
+
+@plot_kind('maple', ['stageout', 'maple'])
+def create_maple_plot(streams, outfile, legend_ncol=5, title=None, step_times=None):
     stage_colours = {
         'm':'#cbd7ea',
         'a': '#b1d0ad',
@@ -90,46 +319,22 @@ def create_maple_plot(streams, outfile, legend_ncol=5, title=None):
         'e': '#a251cb'
     }
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
+    fig, (ax,) = template_figure('verdict')
     if title:
         ax.set_title(title)
-
-    ax.grid(axis='x')
-    # plt.set_axisbelow(True)
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
     ax.set_ylabel("MAPLE property\nevaluation")
-    ax.set_xlabel("Time step")
+    step_axis(ax, step_times)
 
     plot_stages(
         split_merged_stream(streams['stageout']), 
         ax=ax, marker='.', color_map=stage_colours, s=200, zorder=2)
     plot_binary(streams['maple'], ax=ax, zorder=1, color="#444488")
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
-
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.25),
-            fancybox=True, shadow=True, ncol=legend_ncol)
-
+    legend_below(ax, legend_ncol)
     fig.savefig(outfile, bbox_inches='tight')
 
 def maple_plot(folder, legend_ncol=5, title=None):
-    INPUTFILE=folder+"/TWC-output-window.txt"
-    OUTPUTFILE=folder+"/TWC-output-window.pdf"
-
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['stageout', 'maple'])
-    ))
-
-    create_maple_plot(streams, OUTPUTFILE, legend_ncol, title=title)
+    render_one('maple', folder, legend_ncol=legend_ncol, title=title)
 
 def tag_list(l, tag=None):
     return [
@@ -143,7 +348,36 @@ def insert_into_dict_list_and_sort(d:dict, key:str, new_values:list[tuple]):
     d[key] += new_values
     d[key].sort(key=lambda x: x[0])
 
-def create_open_bars(stages):
+def stream_bounds(stream):
+    """First and last step of a stream."""
+    if isinstance(stream, RLEStream):
+        return stream.first_step, stream.end_step - 1
+    return stream[0][0], stream[-1][0]
+
+def pair_intervals(starts, ends, trace_start, trace_end, diagnostics=None):
+    """Pair start and end steps in order of occurrence.
+    An end without a start is clipped to the trace start, and a start without an end stays
+    open until the trace end. Both are added to the diagnostics.
+    """
+    events = sorted([(step, 1) for step in starts] + [(step, 0) for step in ends])
+    pending = deque()
+    pairs = []
+    for step, is_start in events:
+        if is_start:
+            pending.append(step)
+        elif pending:
+            pairs.append((pending.popleft(), step))
+        else:
+            add_diagnostic(diagnostics, step, "End without a start")
+            pairs.append((trace_start, step))
+
+    for step in pending:
+        add_diagnostic(diagnostics, step, "Start without an end")
+        pairs.append((step, trace_end))
+    return pairs
+
+def create_open_bars(stages, diagnostics=None):
+    trace_start, trace_end = stream_bounds(stages)
     stage_split = split_merged_stream(stages)
 
     print(stage_split)
@@ -182,9 +416,9 @@ def create_open_bars(stages):
         v_tags = map(lambda x: x[1], v)
 
         if lifecycle == 'start':
-            combined = zip(v_steps, stage_split['end_'+stage], v_tags)
+            combined = zip(v_steps, stage_split.get('end_'+stage, []), v_tags)
             for start, end, tag in combined:
-                end_stages.remove(stage)
+                end_stages.discard(stage)
                 end_stages.add(stage+tag)
 
                 if 'end_'+stage+tag not in stage_split:
@@ -192,7 +426,8 @@ def create_open_bars(stages):
                 stage_split['end_'+stage+tag].append(end)
 
         else:
-            combined = zip(stage_split['start_'+stage], v_steps, v_tags)
+            stage_starts = stage_split.get('start_'+stage, [])
+            combined = zip(stage_starts, v_steps, v_tags)
             for start, end, tag in combined:
                 try:
                     stages.remove(stage)
@@ -206,25 +441,20 @@ def create_open_bars(stages):
                 stage_split['start_'+stage+tag].append(start)
                 print('start_'+stage+tag, start, end, tag)
 
-    assert stages == end_stages, f"{len(stages)=}, {len(end_stages)=}"
+            # Starts after the last tagged end are still open, e.g. in a truncated trace
+            if len(stage_starts) > len(v):
+                stages.add(stage)
+                stage_split['start_'+stage] = stage_starts[len(v):]
 
     broken_bars = {}
 
-    for stage in stages:
-        stage_starts = stage_split['start_' + stage]
-        stage_ends = stage_split['end_' + stage]
-        print(stage)
-        print(stage_starts)
-        print(stage_ends)
-
-        assert len(stage_starts) == len(stage_ends), f"{stage}: {len(stage_starts)=}, {len(stage_ends)=}"
+    for stage in stages | end_stages:
+        pairs = pair_intervals(
+            stage_split.get('start_' + stage, []),
+            stage_split.get('end_' + stage, []),
+            trace_start, trace_end, diagnostics)
 
-        broken_bars[stage] = list()
-
-        for i in range(len(stage_starts)):
-            step_start = stage_starts[i]
-            step_end = stage_ends[i] 
-            broken_bars[stage].append((step_start, step_end-step_start))
+        broken_bars[stage] = [(start, end - start) for start, end in pairs]
 
     return broken_bars
 
@@ -235,8 +465,8 @@ def sort_maple(x):
     return ['m', 'a', 'aok', 'anom', 'p', 'l', 'e'].index(x.lower())
 
 
-def plot_atomic_bars(stages, ax=plt, **kwargs):
-    bars = create_open_bars(stages)
+def plot_atomic_bars(stages, ax=plt, diagnostics=None, **kwargs):
+    bars = create_open_bars(stages, diagnostics)
     
     observed_nodes = bars.keys()
     observed_nodes = list(observed_nodes)
@@ -265,125 +495,59 @@ def plot_atomic_bars(stages, ax=plt, **kwargs):
     
     return y_ticks, y_ticklabels
 
-def atomic_plot(folder, legend_ncol=3, title=None):
-    INPUTFILE=folder+"/TWC-output-window.txt"
-    OUTPUTFILE=folder+"/TWC-output-window.pdf"
-
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['stageout', 'atomic'])
-    ))
-
-
-    fig = plt.figure(figsize=(8,2))
-    ax = plt.subplot()
+@plot_kind('atomic', lambda params: [params.get('stage_stream', 'stageout'), 'atomic'])
+def create_atomic_plot(streams, outfile, stage_stream='stageout', ylim_top=5, title=None, step_times=None):
+    fig, (ax, ax2) = template_figure('atomic', title=bool(title))
     if title:
         ax.set_title(title)
-    
-    fig.tight_layout()
-
-
-    ax.grid(axis='x')
-    ax.set_axisbelow(True)
 
-    ax2 = ax.twinx()
     plot_binary(streams['atomic'], ax=ax2, zorder=1, color="#444488")
 
-    ax.set_ylim(-1, 5)
+    ax.set_ylim(-1, ylim_top)
     ax2.set_yticks([-1,1])
     ax2.set_yticklabels(['false','true'])
 
-    bar_ticks, bar_ticklabels = plot_atomic_bars(streams['stageout'], ax, zorder=2)
+    bar_ticks, bar_ticklabels = plot_atomic_bars(streams[stage_stream], ax, zorder=2)
     
     ax.set_yticks(bar_ticks)
     ax.set_yticklabels(bar_ticklabels)
 
-    ax2.set_ylabel("Atomic property\nevaluation")
-    ax.set_xlabel("Time step")
-
-    fig.savefig(OUTPUTFILE, bbox_inches='tight')
-
-
-def new_atomic_plot(folder, legend_ncol=3, title=None):
-    INPUTFILE=folder+"/TWC-output-window.txt"
-    OUTPUTFILE=folder+"/TWC-output-window.pdf"
-
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['s', 'atomic'])
-    ))
-
-
-    fig = plt.figure(figsize=(8,2))
-    ax = plt.subplot()
-    if title:
-        ax.set_title(title)
-    
-    fig.tight_layout()
-
-
-    ax.grid(axis='x')
-    ax.set_axisbelow(True)
-
-    ax2 = ax.twinx()
-    plot_binary(streams['atomic'], ax=ax2, zorder=1, color="#444488")
-
-    ax.set_ylim(-1, 6)
-    ax2.set_yticks([-1,1])
-    ax2.set_yticklabels(['false','true'])
+    step_axis(ax, step_times)
 
-    bar_ticks, bar_ticklabels = plot_atomic_bars(streams['s'], ax, zorder=2)
-    
-    ax.set_yticks(bar_ticks)
-    ax.set_yticklabels(bar_ticklabels)
+    fig.savefig(outfile, bbox_inches='tight')
 
-    ax2.set_ylabel("Atomic property\nevaluation")
-    ax.set_xlabel("Time step")
 
-    fig.savefig(OUTPUTFILE, bbox_inches='tight')
+def atomic_plot(folder, legend_ncol=3, title=None):
+    render_one('atomic', folder, title=title)
 
-def plot_knowledge(folder, stream_name, title=None):
-    INPUTFILE=folder+"/TWC-output-window.txt"
-    outfile=folder+"/TWC-output-window.pdf"
 
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,[stream_name, 'missed'])
-    ))
+def new_atomic_plot(folder, legend_ncol=3, title=None):
+    render_one('atomic', folder, stage_stream='s', ylim_top=6, title=title)
 
+@plot_kind('knowledge', lambda params: [params['stream_name'], 'missed'])
+def create_knowledge_plot(streams, outfile, stream_name, title=None, step_times=None):
     stage_colours = {
         'read': '#6688ee',
         'write': '#ee6688'
     }
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
+    fig, (ax,) = template_figure('verdict')
     if title:
         ax.set_title(title)
-    ax.grid(axis='x')
-    # plt.set_axisbelow(True)
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
     ax.set_ylabel(f"Knowledge\nmissed")
-    ax.set_xlabel("Time step")
+    step_axis(ax, step_times)
 
     plot_stages(
         split_merged_stream(streams[stream_name]), 
         ax=ax, marker='.', color_map=stage_colours, s=200, zorder=2)
     plot_binary(streams['missed'], ax=ax, zorder=1, color="#444488")
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
+    legend_below(ax, 2)
+    fig.savefig(outfile, bbox_inches='tight')
 
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.25),
-            fancybox=True, shadow=True, ncol=2)
+def plot_knowledge(folder, stream_name, title=None):
+    render_one('knowledge', folder, stream_name=stream_name, title=title)
 
-    fig.savefig(outfile, bbox_inches='tight')
 
 def plot_labels(stream, ax=plt, y_offset=0, conditinal_format=None, **kwargs):
     for x, l in stream:
@@ -392,109 +556,62 @@ def plot_labels(stream, ax=plt, y_offset=0, conditinal_format=None, **kwargs):
             extra_format = conditinal_format((x, l))
         ax.text(x, y_offset, l, **kwargs, **extra_format)
 
-def plot_sol(folder,input_file=None, output_file=None, title=None):
-    INPUTFILE=folder + '/' + (input_file or "TWC-output-window.txt")
-    outfile=folder + '/' + (output_file or "TWC-output-window.pdf")
-
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['timeout', 'acc', 'clockEcho'])
-    ))
-
+@plot_kind('sol', ['timeout', 'acc', 'clockEcho'])
+def create_sol_plot(streams, outfile, title=None, step_times=None):
     colours = {
         'scan': '#ee6688',
         'timer': '#6688ee'
     }
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
+    fig, (ax,) = template_figure('verdict', grid=False)
     if title:
         ax.set_title(title)
 
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
-
     plot_stages(
         split_merged_stream(streams['clockEcho']), 
         ax=ax, marker='.', s=200, zorder=2, color_map=colours)
     plot_binary(streams['timeout'], ax=ax, zorder=1, color="#444488")
-    plot_labels(streams['acc'], y_offset=0.3, horizontalalignment='center', conditinal_format=lambda x: {'c':'#cc0000'} if x[1] > 10 else {})
+    plot_labels(streams['acc'], ax=ax, y_offset=0.3, horizontalalignment='center', conditinal_format=lambda x: {'c':'#cc0000'} if x[1] > 10 else {})
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
-    
     ax.set_ylabel(f"Timeout")
-    ax.set_xlabel("Time step")
-
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.25),
-            fancybox=True, shadow=True, ncol=2)
+    step_axis(ax, step_times)
 
+    legend_below(ax, 2)
     fig.savefig(outfile, bbox_inches='tight')
 
-def plot_trigger(folder,input_file=None, output_file=None, title=None):
-    INPUTFILE=folder + '/' + (input_file or "TWC-output-window.txt")
-    outfile=folder + '/' + (output_file or "TWC-output-window.pdf")
+def plot_sol(folder,input_file=None, output_file=None, title=None):
+    render_one('sol', folder, input_file, output_file, title=title)
 
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['correctOrder', 'scanOut'])
-    ))
 
+@plot_kind('trigger', ['correctOrder', 'scanOut'])
+def create_trigger_plot(streams, outfile, title=None, step_times=None):
     colours = {
         's': '#ee6688',
         'm': '#6688ee'
     }
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
+    fig, (ax,) = template_figure('verdict', grid=False)
     if title:
         ax.set_title(title)
 
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
-
     plot_stages(
         split_merged_stream(streams['scanOut']), 
         ax=ax, marker='.', s=200, zorder=2, color_map=colours)
     plot_binary(streams['correctOrder'], ax=ax, zorder=1, color="#444488")
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
-    
     ax.set_ylabel(f"Trigger\ncorrect order")
-    ax.set_xlabel("Time step")
-
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.25),
-            fancybox=True, shadow=True, ncol=2)
+    step_axis(ax, step_times)
 
+    legend_below(ax, 2)
     fig.savefig(outfile, bbox_inches='tight')
 
-def plot_phase_write(folder, node_name, input_file=None, output_file=None, ncol=3):
-    INPUTFILE=folder + '/' + (input_file or "TWC-output-window.txt")
-    outfile=folder + '/' + (output_file or "TWC-output-window.pdf")
+def plot_trigger(folder,input_file=None, output_file=None, title=None):
+    render_one('trigger', folder, input_file, output_file, title=title)
 
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['s', 'error'])
-    ))
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
-
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
+@plot_kind('phase_write', ['s', 'error'])
+def create_phase_write_plot(streams, outfile, node_name, ncol=3, step_times=None):
+    fig, (ax,) = template_figure('verdict', grid=False)
 
     opens = []
     closes = []
@@ -525,104 +642,87 @@ def plot_phase_write(folder, node_name, input_file=None, output_file=None, ncol=
         ax=ax, marker='.', s=200, zorder=2, color_map=colours)
     plot_binary(streams['error'], ax=ax, zorder=1, color="#444488")
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
-    
     ax.set_ylabel(f"Phase write\nerror")
-    ax.set_xlabel("Time step")
+    step_axis(ax, step_times)
     ax.set_title(f'Phase write — {node_name}')
 
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.5),
-            fancybox=True, shadow=True, ncol=ncol)
+    legend_below(ax, ncol, y=-.5)
 
     fig.savefig(outfile, bbox_inches='tight')
 
-def plot_anomple(folder,input_file=None, output_file=None, title=None):
-    INPUTFILE=folder + '/' + (input_file or "TWC-output-window.txt")
-    outfile=folder + '/' + (output_file or "TWC-output-window.pdf")
+def plot_phase_write(folder, node_name, input_file=None, output_file=None, ncol=3):
+    render_one('phase_write', folder, input_file, output_file, node_name=node_name, ncol=ncol)
 
-    streams = split_dict(
-    zero_index(
-    read_lola_output(INPUTFILE,['timeout', 'acc', 't'])
-    ))
 
+@plot_kind('anomple', ['timeout', 'acc', 't'])
+def create_anomple_plot(streams, outfile, title=None, step_times=None):
     colours = {
         'timer': '#cbd7ea',
         'anom': '#e02e44',
         'end_e': '#a251cb'
     }
 
-    fig = plt.figure(figsize=(9,2))
-    ax = plt.subplot()
+    fig, (ax,) = template_figure('verdict', grid=False)
     if title:
         ax.set_title(title)
 
-    ax.set_axisbelow(True)
-    ax.set_yticks([-1, 1])
-    ax.set_yticklabels(['false', 'true'])
-    ax.set_ylim(-1.2,1.2)
-
     plot_stages(
         split_merged_stream(streams['t']), 
         ax=ax, marker='.', s=200, zorder=2, color_map=colours)
     plot_binary(streams['timeout'], ax=ax, zorder=1, color="#444488")
 
-    # Shrink current axis's height by 10% on the bottom
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0 + box.height * 0.4,
-                    box.width, box.height * 0.6])
-    
     ax.set_ylabel(f"ANOMPLE\ntimeout")
-    ax.set_xlabel("Time step")
-
-    # Put a legend below current axis
-    ax.legend(loc='upper left', bbox_to_anchor=(-.1, -.25),
-            fancybox=True, shadow=True, ncol=2)
+    step_axis(ax, step_times)
 
+    legend_below(ax, 2)
     fig.savefig(outfile, bbox_inches='tight')
 
-# %% MAPLE-1
-maple_plot("MAPLE-1_2025-05-14_09-31-56", title="MAPLE property")
-
-# %% SINGLETON
-maple_plot("singleton_2025-05-14_11-45-04", legend_ncol=3, title="Singleton property")
-
-# %% Recovering atomic
-atomic_plot("atomicity-1r_2025-05-14_12-05-43", title="Atomicity (with recovery)")
-
-# %% New Atomicity
-new_atomic_plot('new-atomicity_2025-05-14_14-30-34', title="Atomicity (with sub-loops)")
+def plot_anomple(folder,input_file=None, output_file=None, title=None):
+    render_one('anomple', folder, input_file, output_file, title=title)
+
+
+# %% Figures of the thesis
+FIGURES = [
+    # MAPLE-1
+    PlotJob('maple', "MAPLE-1_2025-05-14_09-31-56", params=dict(title="MAPLE property")),
+    # SINGLETON
+    PlotJob('maple', "singleton_2025-05-14_11-45-04", params=dict(legend_ncol=3, title="Singleton property")),
+    # Recovering atomic
+    PlotJob('atomic', "atomicity-1r_2025-05-14_12-05-43", params=dict(title="Atomicity (with recovery)")),
+    # New Atomicity
+    PlotJob('atomic', 'new-atomicity_2025-05-14_14-30-34', params=dict(stage_stream='s', ylim_top=6, title="Atomicity (with sub-loops)")),
+
+    # Knowledge
+    PlotJob('knowledge', 'kLaser_2025-05-15_10-27-19', params=dict(stream_name='kLaserScanEcho', title="Knowledge (laser)")),
+    PlotJob('knowledge', 'kDirections_2025-05-15_11-01-49', params=dict(stream_name='kDirectionsEcho', title="Knowledge (directions)")),
+    PlotJob('knowledge', 'kHandling_2025-05-15_11-07-17', params=dict(stream_name='kHandlingAnomalyEcho', title="Knowledge (handling_anomaly)")),
+    PlotJob('knowledge', 'kIsLegit_2025-05-15_11-12-34', params=dict(stream_name='kIsLegitEcho', title="Knowledge (isLegit)")),
+    PlotJob('knowledge', 'kPlannedLidarMask_2025-05-15_11-28-09', params=dict(stream_name='kPlannedLidarMaskEcho', title="Knowledge (planned_lidar_mask)")),
+
+    # Sign of life
+    PlotJob('sol', 'SOL_2025-05-15_13-29-51', params=dict(title="Sign-of-life")),
+    PlotJob('sol', 'SOL_2025-05-15_13-29-51', 'TWC-output-window2.txt', 'TWC-output-window2.pdf', dict(title="Sign-of-life with introduced error")),
+
+    # Trigger
+    PlotJob('trigger', 'scanTrigger_2025-05-15_14-22-36', params=dict(title="Trigger")),
+    PlotJob('trigger', 'scanTrigger_2025-05-15_14-22-36', 'TWC-output-end.txt', 'TWC-output-end.pdf', dict(title="Trigger (when managing system stops)")),
+
+    # Phase write
+    PlotJob('phase_write', 'AnalysisPhaseWrite_2025-05-15_15-47-17', params=dict(node_name='Analysis')),
+    PlotJob('phase_write', 'ExecutePhaseWrite_2025-05-15_15-50-36', 'TWC-output.txt', 'TWC-output.pdf', dict(node_name='Execute', ncol=4)),
+    PlotJob('phase_write', 'ExecutePhaseWrite_2025-05-15_15-50-36', 'TWC-output-alt.txt', 'TWC-output-alt.pdf', dict(node_name='Execute (Rearranged for error)', ncol=4)),
+    PlotJob('phase_write', 'LegitimatePhaseWrite_2025-05-16_11-39-45', 'TWC-output.txt', 'TWC-output.pdf', dict(node_name='Legitimate', ncol=4)),
+    PlotJob('phase_write', 'MonitorPhaseWrite_2025-05-16_11-47-36', 'TWC-output.txt', 'TWC-output.pdf', dict(node_name='Monitor', ncol=4)),
+    PlotJob('phase_write', 'PlanPhaseWrite_2025-05-16_11-51-56', 'TWC-output.txt', 'TWC-output.pdf', dict(node_name='Plan (before fix)')),
+    PlotJob('phase_write', 'PlanPhaseWrite_2025-05-16_11-56-53', 'TWC-output.txt', 'TWC-output.pdf', dict(node_name='Plan')),
+
+    PlotJob('phase_write', 'AnalysisPhaseWrite_2025-05-16_14-17-14', params=dict(node_name='Analysis (fixed)')),
+
+    # Completion
+    PlotJob('anomple', 'anomple_2025-05-16_13-18-28', 'twc.txt', 'twc.pdf', dict(title="Completion, timeout after 10 timer ticks @100 ms")),
+    PlotJob('anomple', 'anomple_2025-05-16_13-39-08', 'twc.txt', 'twc.pdf', dict(title="Completion, timeout after 50 timer ticks @100 ms")),
+]
 
 # %%
-plot_knowledge('kLaser_2025-05-15_10-27-19', 'kLaserScanEcho', title="Knowledge (laser)")
-plot_knowledge('kDirections_2025-05-15_11-01-49', 'kDirectionsEcho', title="Knowledge (directions)")
-plot_knowledge('kHandling_2025-05-15_11-07-17', 'kHandlingAnomalyEcho', title="Knowledge (handling_anomaly)")
-plot_knowledge('kIsLegit_2025-05-15_11-12-34', 'kIsLegitEcho', title="Knowledge (isLegit)")
-plot_knowledge('kPlannedLidarMask_2025-05-15_11-28-09', 'kPlannedLidarMaskEcho', title="Knowledge (planned_lidar_mask)")
-
-# %% Sign of life
-plot_sol('SOL_2025-05-15_13-29-51', title="Sign-of-life")
-plot_sol('SOL_2025-05-15_13-29-51', 'TWC-output-window2.txt', 'TWC-output-window2.pdf', title="Sign-of-life with introduced error")
-
-#%%
-plot_trigger('scanTrigger_2025-05-15_14-22-36', title="Trigger")
-plot_trigger('scanTrigger_2025-05-15_14-22-36', 'TWC-output-end.txt', 'TWC-output-end.pdf', title="Trigger (when managing system stops)")
-
-
-#%%
-plot_phase_write('AnalysisPhaseWrite_2025-05-15_15-47-17', 'Analysis')
-plot_phase_write('ExecutePhaseWrite_2025-05-15_15-50-36', 'Execute', 'TWC-output.txt', 'TWC-output.pdf', ncol=4)
-plot_phase_write('ExecutePhaseWrite_2025-05-15_15-50-36', 'Execute (Rearranged for error)', 'TWC-output-alt.txt', 'TWC-output-alt.pdf', ncol=4)
-plot_phase_write('LegitimatePhaseWrite_2025-05-16_11-39-45', 'Legitimate', 'TWC-output.txt', 'TWC-output.pdf', ncol=4)
-plot_phase_write('MonitorPhaseWrite_2025-05-16_11-47-36', 'Monitor', 'TWC-output.txt', 'TWC-output.pdf', ncol=4)
-plot_phase_write('PlanPhaseWrite_2025-05-16_11-51-56', 'Plan (before fix)', 'TWC-output.txt', 'TWC-output.pdf')
-plot_phase_write('PlanPhaseWrite_2025-05-16_11-56-53', 'Plan', 'TWC-output.txt', 'TWC-output.pdf')
-
-plot_phase_write('AnalysisPhaseWrite_2025-05-16_14-17-14', 'Analysis (fixed)')
-
-# %% Completion
-plot_anomple('anomple_2025-05-16_13-18-28', 'twc.txt', 'twc.pdf', title="Completion, timeout after 10 timer ticks @100 ms")
-plot_anomple('anomple_2025-05-16_13-39-08', 'twc.txt', 'twc.pdf', title="Completion, timeout after 50 timer ticks @100 ms")
+if __name__ == "__main__":
+    render_batch(FIGURES)
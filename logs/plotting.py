@@ -0,0 +1,28 @@
+"""
+Lazy loading of matplotlib.
+
+Importing pyplot takes about a second, which dominates short conversions run in scripted
+loops. Modules that only plot in some code paths get pyplot through `pyplot()` when a figure
+is actually made.
+"""
+import os
+import sys
+
+
+def pyplot(headless=True):
+    """Import and return `matplotlib.pyplot`.
+
+    Args:
+        headless (bool, optional): Default to the non-GUI "Agg" backend, unless a backend is
+            chosen with MPLBACKEND or we run inside a Jupyter kernel. Only has an effect
+            on the first import of pyplot.
+    """
+    if "matplotlib.pyplot" not in sys.modules:
+        import matplotlib
+
+        if headless and "MPLBACKEND" not in os.environ and "ipykernel" not in sys.modules:
+            matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+
+    return plt
@@ -0,0 +1,319 @@
+#!/bin/env python3
+"""
+Replay the MQTT traffic recorded in a MAPE log, e.g. to load-test the checker without
+running the robot simulation.
+
+Events are re-emitted in their original order, either with the original timing, with the
+timing scaled by a speed factor, or as fast as possible. They can be written to stdout, to a
+file or FIFO, or published on an in-process stand-in for the MQTT broker.
+
+Besides all publications, the log contains receives of messages published outside the
+managed system, like the LiDAR scans on /Scan. Those are replayed as well, once per message.
+
+Usage: python3 replay.py MAPE.log --speed 10 --output /tmp/mape.fifo
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import warnings
+from collections import defaultdict
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from mape_log import read_mape_log
+from message_flow import PUBLISH_ANY_PATTERN, RECEIVE_PATTERN
+
+STR_PAYLOAD_PATTERN = re.compile(r'{"Str": "(.*)"}$')
+INT_PAYLOAD_PATTERN = re.compile(r"[0-9]+$")
+BOOL_PAYLOADS = {"True": "true", "False": "false", "true": "true", "false": "false"}
+# Stream names as accepted by input_parser.py
+STREAM_NAME_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9]*$")
+
+# Sleep until this many seconds before an event is due, then yield to the loop until it is
+SPIN_MARGIN = 0.002
+# Without timing, let other tasks run after this many events
+AFAP_BATCH = 1000
+
+
+class ReplayEvent(NamedTuple):
+    time: float
+    """Seconds since the first event"""
+    topic: str
+    payload: str
+
+
+def log_events(records):
+    """Topic events of a MAPE log in the order of the log.
+
+    Args:
+        records (Iterable[LogRecord]): Output from mape_log.read_mape_log
+
+    Returns:
+        list[ReplayEvent]: All publications, and the receives of the first node subscribed to
+            every topic that is never published in the log
+    """
+    records = list(records)
+    published_topics = set()
+    for record in records:
+        m = PUBLISH_ANY_PATTERN.match(record.message)
+        if m:
+            published_topics.add(m.group(1))
+
+    external_receiver = dict()
+    events = []
+    t0 = None
+    for timestamp, node, level, message in records:
+        m = PUBLISH_ANY_PATTERN.match(message)
+        if m:
+            topic, payload = m.groups()
+        else:
+            m = RECEIVE_PATTERN.match(message)
+            if not m:
+                continue
+            payload, topic = m.groups()
+            if topic in published_topics or external_receiver.setdefault(topic, node) != node:
+                continue
+
+        t = timestamp.timestamp()
+        if t0 is None:
+            t0 = t
+        events.append(ReplayEvent(t - t0, topic, payload))
+    return events
+
+
+def save_events(events, path):
+    """Cache events as JSON lines, so a replay does not have to parse the log again."""
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event._asdict()) + "\n")
+
+
+def load_events(path):
+    with open(path) as f:
+        return [ReplayEvent(**json.loads(line)) for line in f]
+
+
+def read_events(path):
+    """Events of a MAPE log or of an event file written by save_events (*.jsonl)."""
+    if path.endswith(".jsonl"):
+        return load_events(path)
+    return log_events(read_mape_log(path))
+
+
+def format_json(step, event):
+    return json.dumps({"step": step, "topic": event.topic, "payload": event.payload})
+
+
+@lru_cache(maxsize=None)
+def lola_stream_name(topic):
+    """The LOLA stream name of an MQTT topic, in camel case without separators, e.g.
+    "/rv/start_m" becomes "rvStartM". None if the topic has no valid stream name."""
+    words = [w for w in re.split(r"[^a-zA-Z0-9]+", topic) if w]
+    name = "".join(words[:1] + [w[:1].upper() + w[1:] for w in words[1:]])
+    return name if STREAM_NAME_PATTERN.match(name) else None
+
+
+def lola_value(payload):
+    """A payload as a LOLA value. Str payloads become strings like in log_to_lola.py, booleans
+    and non-negative integers are kept, anything else, like JSON objects, is quoted as a string.
+    Double quotes inside strings are replaced by single quotes."""
+    m = STR_PAYLOAD_PATTERN.match(payload)
+    if m:
+        text = m.group(1)
+    elif payload in BOOL_PAYLOADS:
+        return BOOL_PAYLOADS[payload]
+    elif INT_PAYLOAD_PATTERN.match(payload):
+        return payload
+    else:
+        text = payload
+    return '"' + text.replace('\\"', "'").replace('"', "'") + '"'
+
+
+def format_lola(step, event):
+    """One line of a LOLA input file, like log_to_lola.py writes them. None for events on a
+    topic without a valid stream name, with a warning."""
+    stream = lola_stream_name(event.topic)
+    if stream is None:
+        warnings.warn(f"Topic {event.topic!r} has no valid LOLA stream name, its events are skipped")
+        return None
+    return f"{step}: {stream} = {lola_value(event.payload)}"
+
+
+FORMATS = {
+    "json": format_json,
+    "lola": format_lola,
+}
+
+
+class StreamSink:
+    """Write every event as one line of text to a file object. Events the format returns None
+    for are skipped and do not take a step. With `close_file`, closing the sink closes the file."""
+
+    def __init__(self, f, fmt=format_json, close_file=False):
+        self.f = f
+        self.fmt = fmt
+        self.close_file = close_file
+        self.step = 0
+
+    def __call__(self, event):
+        line = self.fmt(self.step, event)
+        if line is None:
+            return
+        self.f.write(line + "\n")
+        self.step += 1
+
+    def close(self):
+        if self.close_file:
+            self.f.close()
+        else:
+            self.f.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(path, fmt=format_json):
+    """A StreamSink writing to stdout ("-"), a file or a FIFO. A FIFO is created if the path
+    does not exist and ends with .fifo. Opening a FIFO blocks until a reader opens it."""
+    if path == "-":
+        return StreamSink(sys.stdout, fmt)
+    if path.endswith(".fifo") and not os.path.exists(path):
+        os.mkfifo(path)
+    return StreamSink(open(path, "w", buffering=1), fmt, close_file=True)
+
+
+class LocalBroker:
+    """In-process stand-in for the MQTT broker. Subscribers get an asyncio queue per topic,
+    "#" subscribes to all topics."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+        self.published = defaultdict(int)
+
+    def subscribe(self, topic="#"):
+        queue = asyncio.Queue()
+        self.subscribers[topic].append(queue)
+        return queue
+
+    def publish(self, topic, payload):
+        self.published[topic] += 1
+        for queue in self.subscribers.get(topic, []) + self.subscribers.get("#", []):
+            queue.put_nowait((topic, payload))
+
+    def __call__(self, event):
+        self.publish(event.topic, event.payload)
+
+    def close(self):
+        for queues in self.subscribers.values():
+            for queue in queues:
+                queue.put_nowait(None)
+
+
+async def replay(events, sink, speed=1.0):
+    """Emit events to a sink with their recorded timing. The first event is emitted right
+    away and the timing is relative to it, so replaying a selection of the events, e.g. a
+    single topic, does not wait for the events left out before it.
+
+    Args:
+        events (list[ReplayEvent]): Events in order
+        sink (Callable[[ReplayEvent], None]): Receives every event
+        speed (float): Time scale, 1 for the original timing, 10 for ten times faster,
+            0 for as fast as possible
+
+    Returns:
+        dict: Number of events, elapsed time, target and achieved rate and how late events were emitted
+    """
+    loop = asyncio.get_running_loop()
+    lateness = np.zeros(len(events))
+    t0 = events[0].time if events else 0.0
+    start = loop.time()
+
+    for i, event in enumerate(events):
+        if speed:
+            due = start + (event.time - t0) / speed
+            delay = due - loop.time()
+            if delay > SPIN_MARGIN:
+                await asyncio.sleep(delay - SPIN_MARGIN)
+            while loop.time() < due:
+                await asyncio.sleep(0)
+            sink(event)
+            lateness[i] = loop.time() - due
+        else:
+            sink(event)
+            if i % AFAP_BATCH == AFAP_BATCH - 1:
+                await asyncio.sleep(0)
+
+    elapsed = loop.time() - start
+    span = events[-1].time - events[0].time if events else 0.0
+    stats = {
+        "events": len(events),
+        "elapsed_s": elapsed,
+        "achieved_rate": len(events) / elapsed if elapsed else float("inf"),
+        "target_rate": len(events) * speed / span if speed and span else float("inf"),
+    }
+    if speed and len(events):
+        stats["mean_late_ms"] = float(lateness.mean() * 1000)
+        stats["max_late_ms"] = float(lateness.max() * 1000)
+    return stats
+
+
+async def replay_to_broker(events, speed=1.0):
+    """Replay on a LocalBroker with a subscriber consuming all topics.
+
+    Returns:
+        tuple[dict, dict[str, int]]: Replay statistics and the messages received per topic
+    """
+    broker = LocalBroker()
+    queue = broker.subscribe("#")
+    received = defaultdict(int)
+
+    async def consume():
+        while (message := await queue.get()) is not None:
+            received[message[0]] += 1
+
+    consumer = asyncio.create_task(consume())
+    stats = await replay(events, broker, speed)
+    broker.close()
+    await consumer
+    return stats, dict(received)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the MQTT events recorded in a MAPE log")
+    parser.add_argument("input", help="MAPE log, or events saved with --save (*.jsonl)", type=str)
+    timing = parser.add_mutually_exclusive_group()
+    timing.add_argument("--speed", help="Time scale (default: 1, the original timing)", type=float, default=1.0)
+    timing.add_argument("--afap", help="Replay as fast as possible", action="store_true")
+    parser.add_argument("-o", "--output", help="stdout (-), a file or a FIFO (*.fifo)", type=str, default="-")
+    parser.add_argument("--broker", help="Publish on an in-process MQTT stand-in instead", action="store_true")
+    parser.add_argument("-f", "--format", help="Output line format", choices=FORMATS.keys(), default="json")
+    parser.add_argument("-t", "--topic", help="Only replay this topic (repeatable)", action="append")
+    parser.add_argument("--save", help="Save the parsed events to this file and exit", type=str)
+    args = parser.parse_args()
+
+    events = read_events(args.input)
+    if args.topic:
+        events = [e for e in events if e.topic in args.topic]
+    if args.save:
+        save_events(events, args.save)
+        sys.exit(0)
+
+    speed = 0 if args.afap else args.speed
+    if args.broker:
+        stats, received = asyncio.run(replay_to_broker(events, speed))
+        for topic, n in sorted(received.items()):
+            print(f"{topic}: {n}", file=sys.stderr)
+    else:
+        with open_output(args.output, FORMATS[args.format]) as sink:
+            stats = asyncio.run(replay(events, sink, speed))
+
+    for k, v in stats.items():
+        print(f"{k}: {v:.3f}" if isinstance(v, float) else f"{k}: {v}", file=sys.stderr)
@@ -0,0 +1,233 @@
+"""
+Run-length encoded streams.
+
+Verdict and stage streams from the TWC output hold the same value for long stretches.
+Instead of one Python object per step, a stream is stored as runs of equal values, so
+memory and plotting cost scale with the number of value changes instead of the trace length.
+"""
+import numpy as np
+
+
+class RLEStream:
+    """A stream stored as runs. Run `i` holds `values[i]` for the steps `starts[i]` up to
+    (but not including) `ends[i]`. Steps not covered by any run have no value.
+
+    Iterating over the stream yields `(step, value)` pairs, the same as the lists produced
+    by `split_dict`, so existing plot code can consume it directly.
+    """
+
+    def __init__(self, starts, ends, values):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.values = np.asarray(values)
+
+    @classmethod
+    def from_steps(cls, steps):
+        """Create a stream from an ordered list of (step, value) pairs."""
+        builder = RLEBuilder()
+        for step, value in steps:
+            builder.append(step, value)
+        return builder.build()
+
+    def __len__(self):
+        return int((self.ends - self.starts).sum())
+
+    def __iter__(self):
+        for start, end, value in zip(self.starts.tolist(), self.ends.tolist(), self.values.tolist()):
+            for step in range(start, end):
+                yield step, value
+
+    def __repr__(self):
+        return f"RLEStream(runs={self.n_runs}, steps={len(self)})"
+
+    @property
+    def n_runs(self):
+        return len(self.starts)
+
+    @property
+    def first_step(self):
+        return int(self.starts[0])
+
+    @property
+    def end_step(self):
+        """One past the last covered step."""
+        return int(self.ends[-1])
+
+    def value_at(self, step):
+        """Value of the stream at `step`.
+
+        Raises:
+            KeyError: The stream has no value at this step
+        """
+        i = np.searchsorted(self.starts, step, side="right") - 1
+        if i < 0 or step >= self.ends[i]:
+            raise KeyError(step)
+        return self.values[i].item()
+
+    def intervals(self, value):
+        """All (start, end) intervals where the stream holds `value`. The end is exclusive."""
+        mask = self.values == value
+        return np.column_stack([self.starts[mask], self.ends[mask]])
+
+    def steps_of(self, value):
+        """All steps where the stream holds `value`."""
+        iv = self.intervals(value)
+        if len(iv) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in iv])
+
+    def split(self):
+        """Equivalent of `split_merged_stream`: map every value to the list of steps holding it."""
+        return {v: self.steps_of(v).tolist() for v in dict.fromkeys(self.values.tolist())}
+
+    def slice(self, start, end):
+        """The runs overlapping the steps `start` up to (but not including) `end`, clipped to them."""
+        lo = np.searchsorted(self.ends, start, side="right")
+        hi = np.searchsorted(self.starts, end, side="left")
+        return RLEStream(
+            np.maximum(self.starts[lo:hi], start), np.minimum(self.ends[lo:hi], end), self.values[lo:hi]
+        )
+
+    def shift(self, offset):
+        return RLEStream(self.starts + offset, self.ends + offset, self.values)
+
+    def step_xy(self, through_end=False):
+        """Coordinates for `ax.step(..., where='post')`, with one point per run plus the last step,
+        or with `through_end` the end of the last run, so the line covers the last step as well."""
+        if self.n_runs == 0:
+            return np.empty(0, dtype=np.int64), self.values
+        xs = np.r_[self.starts, self.ends[-1] - (0 if through_end else 1)]
+        ys = np.r_[self.values, self.values[-1:]]
+        return xs, ys
+
+    def merged(self):
+        """Merge adjacent runs holding the same value."""
+        if self.n_runs < 2:
+            return self
+        joined = (self.ends[:-1] == self.starts[1:]) & (self.values[:-1] == self.values[1:])
+        keep_start = np.r_[True, ~joined]
+        keep_end = np.r_[~joined, True]
+        return RLEStream(self.starts[keep_start], self.ends[keep_end], self.values[keep_start])
+
+    def combine(self, other, func):
+        """Combine two streams run by run with a vectorized binary function.
+
+        The result covers only the steps where both streams have a value.
+        """
+        bounds = np.unique(np.concatenate([self.starts, self.ends, other.starts, other.ends]))
+        seg_starts = bounds[:-1]
+        seg_ends = bounds[1:]
+
+        i = np.searchsorted(self.starts, seg_starts, side="right") - 1
+        j = np.searchsorted(other.starts, seg_starts, side="right") - 1
+        covered = (i >= 0) & (j >= 0)
+        i = np.maximum(i, 0)
+        j = np.maximum(j, 0)
+        covered &= (seg_starts < self.ends[i]) & (seg_starts < other.ends[j])
+
+        values = func(self.values[i[covered]], other.values[j[covered]])
+        return RLEStream(seg_starts[covered], seg_ends[covered], values).merged()
+
+    def map(self, func):
+        """Apply a vectorized function to the values of every run."""
+        return RLEStream(self.starts, self.ends, func(self.values)).merged()
+
+    def __and__(self, other):
+        return self.combine(other, np.logical_and)
+
+    def __or__(self, other):
+        return self.combine(other, np.logical_or)
+
+    def __invert__(self):
+        return self.map(np.logical_not)
+
+
+class RLEBuilder:
+    """Incrementally build an RLEStream from (step, value) pairs in increasing step order.
+
+    The last step may be repeated, e.g. in a TWC output appended to with `tee -a`. Like in a
+    dict of steps, the last value given for it wins.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.values = []
+
+    def append(self, step, value):
+        """Add the value of a step.
+
+        Raises:
+            ValueError: The step lies before the last step
+        """
+        if self.ends and step == self.ends[-1] - 1:
+            self._replace_last(step, value)
+            return
+        if self.ends and step < self.ends[-1]:
+            raise ValueError(f"Step {step} is out of order")
+        if self.ends and self.ends[-1] == step and self.values[-1] == value:
+            self.ends[-1] = step + 1
+        else:
+            self.starts.append(step)
+            self.ends.append(step + 1)
+            self.values.append(value)
+
+    def _replace_last(self, step, value):
+        """Set the value of the last step, splitting it off its run or merging it into the previous one."""
+        if self.values[-1] == value:
+            return
+        if self.starts[-1] < step:
+            self.ends[-1] = step
+        else:
+            self.starts.pop()
+            self.ends.pop()
+            self.values.pop()
+        if self.ends and self.ends[-1] == step and self.values[-1] == value:
+            self.ends[-1] = step + 1
+        else:
+            self.starts.append(step)
+            self.ends.append(step + 1)
+            self.values.append(value)
+
+    def build(self):
+        return RLEStream(self.starts, self.ends, self.values)
+
+
+def zero_index_rle(streams: dict):
+    """Shift all streams so the earliest step of any stream becomes 0, like `zero_index`.
+    Without any runs, there is nothing to shift and the streams are returned as they are."""
+    first_steps = [s.first_step for s in streams.values() if s.n_runs]
+    if not first_steps:
+        return dict(streams)
+    least_index = min(first_steps)
+    return {k: s.shift(-least_index) for k, s in streams.items()}
+
+
+def concatenate_rle(streams: list):
+    """Join streams covering consecutive step ranges, e.g. parsed from consecutive chunks of a file.
+    Runs continuing across the border are merged."""
+    streams = [s for s in streams if s.n_runs]
+    if not streams:
+        return RLEStream([], [], [])
+    return RLEStream(
+        np.concatenate([s.starts for s in streams]),
+        np.concatenate([s.ends for s in streams]),
+        np.concatenate([s.values for s in streams]),
+    ).merged()
+
+
+def save_streams(path, streams: dict):
+    """Store RLE streams in a .npz file, e.g. as a cache of a parsed TWC output."""
+    arrays = dict()
+    for name, s in streams.items():
+        arrays[f"{name}/starts"] = s.starts
+        arrays[f"{name}/ends"] = s.ends
+        arrays[f"{name}/values"] = s.values
+    np.savez(path, **arrays)
+
+
+def load_streams(path):
+    """Load RLE streams stored with `save_streams`."""
+    with np.load(path, allow_pickle=False) as f:
+        names = dict.fromkeys(key.rsplit("/", 1)[0] for key in f.files)
+        return {n: RLEStream(f[f"{n}/starts"], f[f"{n}/ends"], f[f"{n}/values"]) for n in names}
@@ -0,0 +1,307 @@
+#!/bin/env python3
+"""
+SQLite catalog of the run folders (e.g. kLaser_2025-05-15_10-27-19).
+
+The catalog holds the property and start time of every run (from the folder name), the git
+head, size and hash of every file, a summary of every TWC output stream, and the duration
+statistics of the MAPLE phases from MAPE.log. Parsed TWC outputs are cached as .npz files
+(see rle.save_streams) and the catalog points to them.
+
+Updating is incremental: a file is only hashed and parsed again if its size or modification
+time changed. Folders and files that disappeared are removed from the catalog, together with
+their cached .npz files.
+
+Usage:
+    python3 run_catalog.py update [--root .]
+    python3 run_catalog.py query [--property kLaser] [--git-head 7f1e59d] [--stream missed] [--violated-when true]
+
+Which verdict value means a violation depends on the spec: `missed` or `error` are true when
+the property is violated, others like `maple` are false. The catalog stores the steps of both
+values, and a query has to say which one it looks for.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+
+import numpy as np
+
+from mape_log import read_mape_log
+from plot_log_timing import phase_durations, timing_events
+from rle import load_streams, save_streams
+from twc_output import read_lola_output_rle
+
+RUN_FOLDER_PATTERN = re.compile(r"(.+)_(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})$")
+
+DEFAULT_DB = "runs.sqlite"
+CACHE_DIR = ".trace-cache"
+
+# Stored in PRAGMA user_version. Catalogs of an older version are rebuilt from scratch.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    name TEXT PRIMARY KEY,
+    property TEXT NOT NULL,
+    started TEXT,
+    git_head TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_property ON runs (property);
+CREATE INDEX IF NOT EXISTS runs_git_head ON runs (git_head);
+
+CREATE TABLE IF NOT EXISTS files (
+    run TEXT NOT NULL REFERENCES runs (name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    cache TEXT,
+    PRIMARY KEY (run, name)
+);
+
+CREATE TABLE IF NOT EXISTS streams (
+    run TEXT NOT NULL REFERENCES runs (name) ON DELETE CASCADE,
+    file TEXT NOT NULL,
+    stream TEXT NOT NULL,
+    steps INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    true_steps INTEGER,
+    first_true INTEGER,
+    false_steps INTEGER,
+    first_false INTEGER,
+    PRIMARY KEY (run, file, stream)
+);
+CREATE INDEX IF NOT EXISTS streams_stream ON streams (stream);
+
+CREATE TABLE IF NOT EXISTS phases (
+    run TEXT NOT NULL REFERENCES runs (name) ON DELETE CASCADE,
+    node TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean_ms REAL,
+    p90_ms REAL,
+    max_ms REAL,
+    PRIMARY KEY (run, node)
+);
+"""
+
+
+def parse_run_name(name):
+    """Property and start time ("YYYY-mm-dd HH:MM:SS") of a run folder name, or (name, None)."""
+    m = RUN_FOLDER_PATTERN.match(name)
+    if not m:
+        return name, None
+    prop, date, h, mi, s = m.groups()
+    return prop, f"{date} {h}:{mi}:{s}"
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_twc_output(name):
+    return name.lower().startswith("twc") and name.endswith(".txt")
+
+
+def stream_summaries(streams: dict):
+    """(stream, steps, runs, true_steps, first_true, false_steps, first_false) of every stream.
+    The verdict columns are None for streams that are not boolean."""
+    rows = []
+    for name, s in streams.items():
+        verdicts = [None] * 4
+        if s.values.dtype == bool:
+            verdicts = []
+            for value in [True, False]:
+                iv = s.intervals(value)
+                verdicts += [int((iv[:, 1] - iv[:, 0]).sum()), int(iv[0, 0]) if len(iv) else None]
+        rows.append((name, len(s), s.n_runs, *verdicts))
+    return rows
+
+
+def phase_stats(log_path):
+    """(node, count, mean_ms, p90_ms, max_ms) of the MAPLE phases in a MAPE log."""
+    events, _ = timing_events(read_mape_log(log_path))
+    rows = []
+    for node, durations in phase_durations(events).items():
+        ms = np.array([d.total_seconds() * 1000 for d in durations])
+        rows.append((node, len(ms), float(ms.mean()), float(np.percentile(ms, 90)), float(ms.max())))
+    return rows
+
+
+class RunCatalog:
+    """The catalog database of a directory of run folders."""
+
+    def __init__(self, root=".", db_path=None):
+        self.root = root
+        self.db = sqlite3.connect(db_path or os.path.join(root, DEFAULT_DB))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        (version,) = self.db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS phases; DROP TABLE IF EXISTS streams; "
+                                  "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS runs;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            shutil.rmtree(os.path.join(root, CACHE_DIR), ignore_errors=True)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def run_folders(self):
+        return sorted(
+            os.path.basename(os.path.dirname(p))
+            for p in glob.glob(os.path.join(self.root, "*", ""))
+            if not os.path.basename(os.path.dirname(p)).startswith((".", "__"))
+        )
+
+    def update(self, verbose=False):
+        """Bring the catalog up to date with the run folders on disk.
+
+        Returns:
+            int: Number of files that were (re)indexed
+        """
+        folders = self.run_folders()
+        indexed = 0
+        with self.db:
+            known = {name for (name,) in self.db.execute("SELECT name FROM runs")}
+            for name in known - set(folders):
+                self.db.execute("DELETE FROM runs WHERE name = ?", (name,))
+                shutil.rmtree(os.path.join(self.root, CACHE_DIR, name), ignore_errors=True)
+            for name in folders:
+                indexed += self._update_run(name, verbose)
+        return indexed
+
+    def _update_run(self, run, verbose):
+        folder = os.path.join(self.root, run)
+        git_head_path = os.path.join(folder, "git-head.txt")
+        git_head = None
+        if os.path.exists(git_head_path):
+            with open(git_head_path) as f:
+                git_head = f.read().strip() or None
+        prop, started = parse_run_name(run)
+        self.db.execute(
+            "INSERT INTO runs (name, property, started, git_head) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET property = excluded.property, "
+            "started = excluded.started, git_head = excluded.git_head",
+            (run, prop, started, git_head),
+        )
+
+        known = {
+            name: (size, mtime_ns)
+            for name, size, mtime_ns in self.db.execute("SELECT name, size, mtime_ns FROM files WHERE run = ?", (run,))
+        }
+        names = sorted(n for n in os.listdir(folder) if os.path.isfile(os.path.join(folder, n)))
+        for name in set(known) - set(names):
+            self._forget_file(run, name)
+
+        indexed = 0
+        for name in names:
+            path = os.path.join(folder, name)
+            st = os.stat(path)
+            if known.get(name) == (st.st_size, st.st_mtime_ns):
+                continue
+            if verbose:
+                print(f"indexing {run}/{name}", file=sys.stderr)
+            self._forget_file(run, name)
+            self._index_file(run, name, path, st)
+            indexed += 1
+        return indexed
+
+    def _forget_file(self, run, name):
+        row = self.db.execute("SELECT cache FROM files WHERE run = ? AND name = ?", (run, name)).fetchone()
+        if row and row[0]:
+            try:
+                os.remove(os.path.join(self.root, row[0]))
+            except FileNotFoundError:
+                pass
+        self.db.execute("DELETE FROM files WHERE run = ? AND name = ?", (run, name))
+        self.db.execute("DELETE FROM streams WHERE run = ? AND file = ?", (run, name))
+        if name == "MAPE.log":
+            self.db.execute("DELETE FROM phases WHERE run = ?", (run,))
+
+    def _index_file(self, run, name, path, st):
+        cache = None
+        if is_twc_output(name):
+            streams = read_lola_output_rle(path)
+            cache = os.path.join(CACHE_DIR, run, name[:-len(".txt")] + ".npz")
+            os.makedirs(os.path.dirname(os.path.join(self.root, cache)), exist_ok=True)
+            save_streams(os.path.join(self.root, cache), streams)
+            self.db.executemany(
+                "INSERT INTO streams VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run, name, *row) for row in stream_summaries(streams)],
+            )
+        elif name == "MAPE.log":
+            self.db.executemany("INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?)", [(run, *row) for row in phase_stats(path)])
+
+        self.db.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (run, name, st.st_size, st.st_mtime_ns, file_sha1(path), cache),
+        )
+
+    def find_runs(self, property=None, git_head=None, stream=None, violated_when=None):
+        """Names of the runs matching all given conditions.
+
+        Args:
+            property (str, optional): Property of the run, as in the folder name
+            git_head (str, optional): Prefix of the git head of the run
+            stream (str, optional): The run has a TWC output with this stream
+            violated_when (bool, optional): The verdict value meaning a violation. A boolean
+                stream (`stream`, if given) holds this value at some step.
+        """
+        query = "SELECT DISTINCT runs.name FROM runs"
+        conditions = []
+        params = []
+        if stream or violated_when is not None:
+            query += " JOIN streams ON streams.run = runs.name"
+        if property:
+            conditions.append("runs.property = ?")
+            params.append(property)
+        if git_head:
+            conditions.append("runs.git_head LIKE ?")
+            params.append(git_head + "%")
+        if stream:
+            conditions.append("streams.stream = ?")
+            params.append(stream)
+        if violated_when is not None:
+            conditions.append("streams.true_steps > 0" if violated_when else "streams.false_steps > 0")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [name for (name,) in self.db.execute(query + " ORDER BY runs.name", params)]
+
+    def load_trace(self, run, file):
+        """The cached RLE streams of a TWC output of a run."""
+        row = self.db.execute("SELECT cache FROM files WHERE run = ? AND name = ?", (run, file)).fetchone()
+        if row is None or row[0] is None:
+            raise KeyError(f"{run}/{file} is not a cached TWC output")
+        return load_streams(os.path.join(self.root, row[0]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catalog of the run folders")
+    parser.add_argument("command", choices=["update", "query"])
+    parser.add_argument("--root", help="Directory containing the run folders", type=str, default=".")
+    parser.add_argument("--db", help=f"Catalog file (default: ROOT/{DEFAULT_DB})", type=str)
+    parser.add_argument("-p", "--property", type=str)
+    parser.add_argument("-g", "--git-head", help="Git head or a prefix of it", type=str)
+    parser.add_argument("-s", "--stream", help="Runs with a TWC output stream of this name", type=str)
+    parser.add_argument(
+        "--violated-when", choices=["true", "false"],
+        help="Runs where a boolean stream holds this value, i.e. the verdict value meaning a violation",
+    )
+    args = parser.parse_args()
+
+    catalog = RunCatalog(args.root, args.db)
+    if args.command == "update":
+        n = catalog.update(verbose=True)
+        print(f"{n} files indexed", file=sys.stderr)
+    else:
+        violated_when = None if args.violated_when is None else args.violated_when == "true"
+        for name in catalog.find_runs(args.property, args.git_head, args.stream, violated_when):
+            print(name)
+    catalog.close()
@@ -0,0 +1,274 @@
+#!/bin/env python3
+"""
+One command line for the tools working on a run folder (e.g. kLaser_2025-05-15_10-27-19).
+
+Any combination of commands can be given in one call. Every source file of the run
+(MAPE.log, MAPE.input, the TWC outputs) is read at most once and the parsed data is
+shared between the commands:
+
+    python3 run_tools.py kLaser_2025-05-15_10-27-19 convert timing plots stats --stream kLaserScan
+
+With --spec, the declared streams of a LOLA spec select what is read: only its input streams
+are extracted from MAPE.log and only its output streams are parsed from the TWC outputs.
+"""
+import argparse
+import glob
+import os
+import sys
+from functools import cached_property
+
+from input_parser import collect_rle, collect_steps, format_atomic, parse_lines
+from log_to_lola import write_lola
+from lola_spec import read_spec
+from mape_log import iter_log_offsets, read_published_events, select_publications
+from parallel_parse import (
+    publications_parallel,
+    published_events_parallel,
+    read_lola_output_rle_parallel,
+    timing_events_parallel,
+)
+from plot_log_timing import timing_events
+from step_index import load_step_index
+from twc_output import read_lola_output_rle
+
+STAGE_STREAMS = ["stage", "stage2", "atomicstage", "stageout", "s"]
+
+
+class RunFolder:
+    """The files of a run folder. Each file is parsed on first use and then cached.
+
+    With `jobs` > 1, MAPE.log and the TWC outputs are parsed in chunks by that many processes.
+    The full list of log records is then never built.
+
+    With a `spec` (lola_spec.LolaSpec), only the topics of its input streams are collected from
+    MAPE.log and only its output streams are kept from the TWC outputs.
+    """
+
+    def __init__(self, path, jobs=1, spec=None):
+        self.path = path
+        self.jobs = jobs
+        self.spec = spec
+        self.name = os.path.basename(os.path.normpath(path))
+        self._twc_outputs = dict()
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    @cached_property
+    def log_offsets(self):
+        """(byte offset, record) of every line of MAPE.log. The offsets locate the lines of the
+        steps in the step index."""
+        return list(iter_log_offsets(self.file("MAPE.log")))
+
+    @cached_property
+    def log(self):
+        return [record for _, record in self.log_offsets]
+
+    @cached_property
+    def publications(self):
+        """(byte offset, record, topic, value) of every publication in MAPE.log, taken from the
+        parsed records. With `jobs` > 1 and the records not parsed yet, only the publishing
+        lines are parsed, in chunks."""
+        if self.jobs > 1 and "log_offsets" not in self.__dict__:
+            return publications_parallel(self.file("MAPE.log"), self.jobs)
+        return list(select_publications(self.log_offsets))
+
+    @cached_property
+    def published(self):
+        """{topic: [value, ...]} of MAPE.log, of the input streams of the spec if there is one.
+        The log is only scanned for it if no other command parsed it already."""
+        topics = set(self.spec.inputs) if self.spec else None
+        if "log_offsets" not in self.__dict__ and "publications" not in self.__dict__:
+            if self.jobs > 1:
+                return published_events_parallel(self.file("MAPE.log"), self.jobs, topics)
+            if topics is not None:
+                return read_published_events(self.file("MAPE.log"), topics)
+        events = {}
+        for _, _, topic, value in self.publications:
+            if topics is None or topic in topics:
+                events.setdefault(topic, []).append(value)
+        return events
+
+    @cached_property
+    def timing(self):
+        """(events, observed_nodes) of the MAPE.log, see `plot_log_timing.timing_events`."""
+        if self.jobs > 1:
+            return timing_events_parallel(self.file("MAPE.log"), self.jobs)
+        return timing_events(self.log)
+
+    @cached_property
+    def input_events(self):
+        with open(self.file("MAPE.input")) as f:
+            return list(parse_lines(f))
+
+    @cached_property
+    def input_steps(self):
+        return collect_steps(self.input_events)
+
+    @cached_property
+    def input_streams(self):
+        return collect_rle(self.input_events)
+
+    @cached_property
+    def twc_files(self):
+        """Names of the TWC output files in the folder."""
+        return sorted(
+            os.path.basename(p)
+            for p in glob.glob(self.file("*.txt"))
+            if os.path.basename(p).lower().startswith("twc")
+        )
+
+    def twc_output(self, name):
+        """The streams of a TWC output file as RLE streams: all of them, or the outputs of the spec."""
+        if name not in self._twc_outputs:
+            streams = list(self.spec.outputs) if self.spec else None
+            if self.jobs > 1:
+                self._twc_outputs[name] = read_lola_output_rle_parallel(self.file(name), streams, self.jobs)
+            else:
+                self._twc_outputs[name] = read_lola_output_rle(self.file(name), streams)
+        return self._twc_outputs[name]
+
+
+def cmd_convert(run: RunFolder, args):
+    if args.stream:
+        streams = [args.stream]
+    elif run.spec and run.spec.inputs:
+        streams = list(run.spec.inputs)
+    else:
+        raise SystemExit("convert: the stream to watch must be given with --stream or --spec")
+    publications = [p for p in run.publications if p[2] in streams]
+    if not write_lola(publications, os.path.join(args.output_dir, args.lola_output)):
+        raise SystemExit(f"convert: no events found on {', '.join(streams)}")
+
+
+def cmd_timing(run: RunFolder, args):
+    from plot_log_timing import plot_timing
+
+    events, observed_nodes = run.timing
+    plot_timing(events, observed_nodes, os.path.join(args.output_dir, "timing.png"))
+
+
+def cmd_atomic(run: RunFolder, args):
+    from input_parser import plot_maple_stages, save_fig, set_fig_title
+
+    diagnostics = []
+    plot = plot_maple_stages(format_atomic(run.input_steps, diagnostics), diagnostics)
+    set_fig_title(run.name)(plot)
+    save_fig(os.path.join(args.output_dir, "atomic.png"))(plot)
+    for step, message in diagnostics:
+        print(f"atomic: step {step}: {message}", file=sys.stderr)
+
+
+def cmd_plots(run: RunFolder, args):
+    """Render the figures of FIGURES in plot_lola.py that belong to this run."""
+    from plot_lola import FIGURES, render_batch, required_streams
+
+    jobs = [job._replace(folder=args.output_dir) for job in FIGURES if job.folder == run.name]
+    if not jobs:
+        print(f"plots: no figures defined for {run.name}", file=sys.stderr)
+        return
+    if run.spec:
+        for job in jobs:
+            missing = [s for s in required_streams(job) if s not in run.spec.outputs]
+            if missing:
+                raise SystemExit(
+                    f"plots: {job.output_file} ({job.kind}) draws {', '.join(missing)}, which the spec does not output"
+                )
+    render_batch(
+        jobs,
+        read=lambda path, streams: run.twc_output(os.path.basename(path)),
+        step_index=(lambda path: load_step_index(run.file("MAPE.input"))) if args.time_axis else None,
+    )
+
+
+def cmd_flow(run: RunFolder, args):
+    from message_flow import flow_report, plot_message_flow, trace_message_flow
+
+    deliveries, unmatched = trace_message_flow(run.log)
+    print(flow_report(deliveries, unmatched))
+    plot_message_flow(deliveries, os.path.join(args.output_dir, "flow.png"))
+
+
+def cmd_scans(run: RunFolder, args):
+    """Extract the LiDAR scans of MAPE.log (see scan_matrix.py) and summarize them."""
+    from scan_matrix import scan_summaries, scans
+
+    matrix = scans(run.file("MAPE.log"))
+    summary = scan_summaries(matrix)
+    print(f"scans: {matrix.ranges.shape[0]} x {matrix.ranges.shape[1]} beams")
+    if len(matrix.times_us):
+        print(f"  closest range: {summary['min_range'].min():.3f} m")
+        print(f"  scans with obstacles: {int((summary['obstacles'].sum(axis=1) > 0).sum())}")
+        print(f"  inf ratio: {summary['inf_ratio'].mean():.3f}")
+
+
+def cmd_stats(run: RunFolder, args):
+    from maple_loops import loop_iterations, loop_throughput
+
+    if os.path.exists(run.file("MAPE.log")):
+        log = run.log
+        print(f"MAPE.log: {len(log)} records, {(log[-1].timestamp - log[0].timestamp).total_seconds():.3f} s")
+        for topic, values in sorted(run.published.items()):
+            print(f"  {topic}: {len(values)} published")
+
+    if os.path.exists(run.file("MAPE.input")):
+        print(f"MAPE.input: {len(run.input_steps)} steps")
+        for name, stream in run.input_streams.items():
+            print(f"  {name}: {len(stream)} events, {stream.n_runs} runs")
+            if name in STAGE_STREAMS:
+                for k, v in loop_throughput(loop_iterations(stream)).items():
+                    print(f"    {k}: {v}")
+
+    for file in run.twc_files:
+        print(f"{file}:")
+        for name, stream in run.twc_output(file).items():
+            line = f"  {name}: {len(stream)} steps, {stream.n_runs} runs"
+            if stream.values.dtype == bool:
+                false_runs = stream.intervals(False)
+                n_false = int((false_runs[:, 1] - false_runs[:, 0]).sum())
+                line += f", false at {n_false} steps"
+                if n_false:
+                    line += f" (first at step {false_runs[0, 0]})"
+            print(line)
+
+
+COMMANDS = {
+    "convert": cmd_convert,
+    "timing": cmd_timing,
+    "atomic": cmd_atomic,
+    "plots": cmd_plots,
+    "flow": cmd_flow,
+    "scans": cmd_scans,
+    "stats": cmd_stats,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Process a run folder. Commands are run in the given order and share the parsed files."
+    )
+    parser.add_argument("folder", help="The run folder", type=str)
+    parser.add_argument("commands", nargs="+", choices=COMMANDS.keys(), help="Commands to run")
+    parser.add_argument("-s", "--stream", help="convert: the stream name to watch", type=str)
+    parser.add_argument("--spec", help="LOLA spec whose declared streams are read", type=str)
+    parser.add_argument(
+        "--lola-output", help="convert: name of the LOLA input file to write", type=str, default="MAPE.input"
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="Where to write outputs (default: the run folder)", type=str
+    )
+    parser.add_argument(
+        "--time-axis", help="plots: use wall-clock time from MAPE.input.steps on the x axis", action="store_true"
+    )
+    parser.add_argument(
+        "-j", "--jobs", help="Parse large files with this many processes (default: 1)", type=int, default=1
+    )
+    args = parser.parse_args()
+
+    if args.output_dir is None:
+        args.output_dir = args.folder
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    run = RunFolder(args.folder, args.jobs, read_spec(args.spec) if args.spec else None)
+    for command in args.commands:
+        COMMANDS[command](run, args)
@@ -0,0 +1,186 @@
+#!/bin/env python3
+"""
+Extract the LiDAR scans received by the Monitor from a MAPE log into a float32 matrix on disk.
+
+Every scan is one "Received MQTT message: {"angle_min": ..., "ranges": [...]} on topic: /Scan"
+line of about 7 KB. Decoding them once gives three files next to the log:
+
+    MAPE.scans.f32          ranges, one row of float32 per scan (scans x beams), memory-mapped when loaded
+    MAPE.scans.times.npy    timestamp of every scan in microseconds since the epoch (see step_index)
+    MAPE.scans.json         shape, angles and range limits of the scanner
+
+Rows are written while the log is read, so memory use does not grow with the number of scans.
+
+Usage: python3 scan_matrix.py [MAPE log file] [sectors] [obstacle distance in m]
+"""
+import json
+import os
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+from mape_log import parse_log_line
+from step_index import to_epoch_us
+
+SCAN_MESSAGE = 'Received MQTT message: {"angle_min":'
+SCAN_NODE = "Monitor"
+RANGES_KEY = '"ranges": ['
+
+# Rows per block when computing summaries of a memory-mapped matrix
+SUMMARY_BLOCK = 65536
+
+
+class ScanMatrix(NamedTuple):
+    ranges: np.ndarray
+    """(scans x beams) float32, inf where nothing was hit and -inf where the hit was too close"""
+    times_us: np.ndarray
+    angle_min: float
+    angle_increment: float
+    range_min: float
+    range_max: float
+
+
+def scan_paths(log_path):
+    prefix = os.path.splitext(log_path)[0] + ".scans"
+    return prefix + ".f32", prefix + ".times.npy", prefix + ".json"
+
+
+def parse_ranges(message):
+    """The ranges of a scan message. Python's float parses both "Infinity" and "inf"."""
+    i = message.index(RANGES_KEY) + len(RANGES_KEY)
+    j = message.index("]", i)
+    return np.array(message[i:j].split(","), dtype=np.float32)
+
+
+def scan_header(message):
+    """All fields of a scan message except the ranges."""
+    i = message.index("{")
+    j = message.index(RANGES_KEY)
+    return json.loads(message[i:j].rstrip(", ") + "}")
+
+
+def extract_scans(log_path, node=SCAN_NODE):
+    """Decode all scans received by `node` and write the scan files next to the log.
+
+    Raises:
+        ValueError: A scan has a different number of beams than the first one
+
+    Returns:
+        ScanMatrix: The scans, memory-mapped from the written files
+    """
+    matrix_path, times_path, info_path = scan_paths(log_path)
+    times = []
+    info = None
+
+    with open(log_path) as f, open(matrix_path, "wb") as out:
+        for line in f:
+            if SCAN_MESSAGE not in line:
+                continue
+            record = parse_log_line(line)
+            if record.node != node:
+                continue
+            ranges = parse_ranges(record.message)
+            if info is None:
+                info = scan_header(record.message)
+                info["beams"] = len(ranges)
+            elif len(ranges) != info["beams"]:
+                raise ValueError(f"Scan at {record.timestamp} has {len(ranges)} beams, expected {info['beams']}")
+            out.write(ranges.astype("<f4").tobytes())
+            times.append(to_epoch_us(record.timestamp))
+
+    info = info or {"beams": 0}
+    info["scans"] = len(times)
+    info["node"] = node
+    np.save(times_path, np.array(times, dtype=np.int64))
+    with open(info_path, "w") as f:
+        json.dump(info, f, indent=1)
+    return load_scans(log_path)
+
+
+def load_scans(log_path):
+    """Load the scan files written by extract_scans, with the ranges memory-mapped."""
+    matrix_path, times_path, info_path = scan_paths(log_path)
+    with open(info_path) as f:
+        info = json.load(f)
+    shape = (info["scans"], info["beams"])
+    if info["scans"]:
+        ranges = np.memmap(matrix_path, dtype="<f4", mode="r", shape=shape)
+    else:
+        ranges = np.empty(shape, dtype=np.float32)
+    return ScanMatrix(
+        ranges,
+        np.load(times_path),
+        info.get("angle_min", 0.0),
+        info.get("angle_increment", 0.0),
+        info.get("range_min", 0.0),
+        info.get("range_max", np.inf),
+    )
+
+
+def scans(log_path, node=SCAN_NODE):
+    """The scans of a log, extracted on first use and loaded from the scan files afterwards."""
+    matrix_path, times_path, info_path = scan_paths(log_path)
+    if os.path.exists(info_path) and os.path.getmtime(info_path) >= os.path.getmtime(log_path):
+        return load_scans(log_path)
+    return extract_scans(log_path, node)
+
+
+def scan_summaries(scans: ScanMatrix, sectors=8, obstacle_distance=0.5):
+    """Per-scan summaries, computed block by block.
+
+    Args:
+        scans (ScanMatrix): Output from extract_scans or load_scans
+        sectors (int): Number of equally sized angular sectors, starting at angle_min
+        obstacle_distance (float): Beams hitting something closer than this (in m) count as an obstacle
+
+    Returns:
+        dict[str, np.ndarray]: min_range of the finite ranges (inf if there are none), inf_ratio
+            (both +inf, nothing hit, and -inf, closer than range_min), nan_ratio and obstacles
+            (scans x sectors), the number of obstacle beams per sector
+    """
+    n, beams = scans.ranges.shape
+    # One column per sector marking its beams. With more sectors than beams, some sectors
+    # have no beams and count no obstacles.
+    sector_of_beam = np.arange(beams) * sectors // max(beams, 1)
+    in_sector = (sector_of_beam[:, None] == np.arange(sectors)).astype(np.int32)
+
+    result = {
+        "min_range": np.empty(n, dtype=np.float32),
+        "inf_ratio": np.empty(n),
+        "nan_ratio": np.empty(n),
+        "obstacles": np.empty((n, sectors), dtype=np.int32),
+    }
+    for start in range(0, n, SUMMARY_BLOCK):
+        block = np.asarray(scans.ranges[start:start + SUMMARY_BLOCK])
+        rows = slice(start, start + len(block))
+        nan = np.isnan(block)
+        result["nan_ratio"][rows] = nan.mean(axis=1)
+        result["inf_ratio"][rows] = np.isinf(block).mean(axis=1)
+        result["min_range"][rows] = np.where(np.isfinite(block), block, np.inf).min(axis=1)
+
+        # -inf (closer than range_min) counts as an obstacle, NaN does not
+        obstacle = block < obstacle_distance
+        result["obstacles"][rows] = obstacle.astype(np.int32) @ in_sector
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise RuntimeError(f"Usage: python3 {sys.argv[0]} [MAPE log file] [sectors] [obstacle distance in m]")
+
+    sectors = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    distance = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    matrix = scans(sys.argv[1])
+    summary = scan_summaries(matrix, sectors, distance)
+    t0 = matrix.times_us[0] if len(matrix.times_us) else 0
+    print("time_s\tmin_range\tinf_ratio\tnan_ratio\tobstacles per sector")
+    for t, m, i, nan, obstacles in zip(
+        ((matrix.times_us - t0) / 1e6).tolist(),
+        summary["min_range"].tolist(),
+        summary["inf_ratio"].tolist(),
+        summary["nan_ratio"].tolist(),
+        summary["obstacles"].tolist(),
+    ):
+        print(f"{t:.3f}\t{m:.3f}\t{i:.3f}\t{nan:.3f}\t{' '.join(map(str, obstacles))}")
@@ -0,0 +1,150 @@
+#!/bin/env python3
+"""
+Map the time steps of a LOLA input (and so of the TWC output) back to the MAPE log.
+
+log_to_lola.py turns every value published on the watched stream into one step and drops
+its timestamp. The step index keeps it: a small binary file next to the LOLA input
+(MAPE.input.steps) with a fixed-size entry per step holding the log timestamp in
+microseconds since the epoch and the byte offset of the log line. The file is memory
+mapped, so looking up a step does not read the rest of the index.
+
+Timestamps are taken as written in the log, without converting them to UTC.
+
+Usage: python3 step_index.py [step index] [MAPE log file] [step]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from mape_log import iter_publications
+
+MAGIC = b"STEPIDX1"
+HEADER_SIZE = len(MAGIC)
+STEP_DTYPE = np.dtype([("time_us", "<i8"), ("offset", "<i8")])
+SUFFIX = ".steps"
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_us(timestamp: datetime):
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def publication_index(path, streams):
+    """Timestamp and byte offset of every value published on `streams`, i.e. of every step
+    log_to_lola.py writes for them.
+
+    Args:
+        path (str): MAPE log
+        streams (str | Collection[str]): One stream name or several
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Microseconds since the epoch and byte offsets
+    """
+    topics = {streams} if isinstance(streams, str) else set(streams)
+    times = []
+    offsets = []
+    for offset, record, _, _ in iter_publications(path, topics):
+        times.append(to_epoch_us(record.timestamp))
+        offsets.append(offset)
+    return np.array(times, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def write_step_index(path, times_us, offsets):
+    entries = np.empty(len(times_us), dtype=STEP_DTYPE)
+    entries["time_us"] = times_us
+    entries["offset"] = offsets
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(entries.tobytes())
+
+
+class StepIndex:
+    """A step index file, see the module description.
+
+    Raises:
+        ValueError: The file is not a step index
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(HEADER_SIZE) != MAGIC:
+                raise ValueError(f"{path} is not a step index")
+            f.seek(0, 2)
+            empty = f.tell() == HEADER_SIZE
+        # np.memmap cannot map an empty range
+        if empty:
+            self.entries = np.empty(0, dtype=STEP_DTYPE)
+        else:
+            self.entries = np.memmap(path, dtype=STEP_DTYPE, mode="r", offset=HEADER_SIZE)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def time_us(self, step):
+        return int(self.entries[step]["time_us"])
+
+    def wall_time(self, step):
+        return EPOCH + timedelta(microseconds=self.time_us(step))
+
+    def offset(self, step):
+        return int(self.entries[step]["offset"])
+
+    def step_at(self, timestamp: datetime):
+        """The last step at or before `timestamp`, -1 if the index starts later."""
+        return int(np.searchsorted(self.entries["time_us"], to_epoch_us(timestamp), side="right")) - 1
+
+    def step_times(self):
+        """Seconds since the first step, for every step."""
+        times = self.entries["time_us"]
+        return (times - times[0]) / 1e6 if len(times) else np.empty(0)
+
+    def log_lines(self, log_path, step, context=0):
+        """The log line of a step and `context` lines after it."""
+        with open(log_path, "rb") as f:
+            f.seek(self.offset(step))
+            return [f.readline().decode().rstrip("\n") for _ in range(context + 1)]
+
+
+def index_path(lola_input):
+    return lola_input + SUFFIX
+
+
+def load_step_index(lola_input):
+    """The step index next to a LOLA input, or None if there is none."""
+    try:
+        return StepIndex(index_path(lola_input))
+    except FileNotFoundError:
+        return None
+
+
+def input_step_times(lola_input, streams):
+    """Wall-clock seconds of the steps of a LOLA input, from its step index if there is one,
+    otherwise from the publications on `streams` in the MAPE.log next to it.
+
+    Returns:
+        np.ndarray | None: Seconds since the first step, or None without an index or log
+    """
+    index = load_step_index(lola_input)
+    if index is not None and len(index):
+        return index.step_times()
+    log = os.path.join(os.path.dirname(os.path.abspath(lola_input)), "MAPE.log")
+    if os.path.exists(log):
+        times_us, _ = publication_index(log, streams)
+        if len(times_us):
+            return (times_us - times_us[0]) / 1e6
+    return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        raise RuntimeError(f"Usage: python3 {sys.argv[0]} [step index] [MAPE log file] [step]")
+
+    index = StepIndex(sys.argv[1])
+    step = int(sys.argv[3])
+    print(f"step {step}: {index.wall_time(step)}")
+    for line in index.log_lines(sys.argv[2], step, context=5):
+        print(line)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tools are scripts importing their sibling modules, as when run from the logs folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+from lola_spec import parse_spec
+
+SPEC = """
+// Inputs from MAPE.log
+in stage: Str
+in scanTrigger : Str // trailing comment
+out maple: Bool
+out missed
+aux seen: Bool = default(seen[-1], false)
+maple = stage == "m" || seen
+// out commented: Bool
+"""
+
+
+def test_parse_spec():
+    spec = parse_spec(SPEC)
+    assert spec.inputs == {"stage": "Str", "scanTrigger": "Str"}
+    assert spec.outputs == {"maple": "Bool", "missed": None}
+    assert spec.aux == {"seen": "Bool"}
+
+
+def test_declaration_order_is_kept():
+    spec = parse_spec("out b: Bool\nout a: Bool\nout c: Bool\n")
+    assert list(spec.outputs) == ["b", "a", "c"]
+
+
+def test_definitions_are_not_declarations():
+    spec = parse_spec("input = 3\nout x: Int = input + 1\n")
+    assert spec.inputs == {}
+    assert spec.outputs == {"x": "Int"}
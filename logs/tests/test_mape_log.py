@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from mape_log import (
+    iter_log_offsets,
+    iter_publications,
+    parse_log_line,
+    parse_publication,
+    published_events,
+    select_publications,
+)
+
+LINES = [
+    '2025-05-14 09:31:56,100 - Monitor - INFO - Published to MQTT topic stage: {"Str": "m"}\n',
+    '2025-05-14 09:31:56,200 - Execute - INFO - Published to MQTT topic /spin_config: {"period": 8}\n',
+    "2025-05-14 09:31:56,300 - Analysis - INFO - Received MQTT message: m on topic: stage\n",
+    '2025-05-14 09:31:56,400 - Analysis - INFO - Published to MQTT topic other: {"Str": "a b"}\n',
+]
+
+
+def test_parse_publication():
+    assert parse_publication(LINES[0]) == ("stage", "m")
+    assert parse_publication(LINES[3]) == ("other", "a b")
+    assert parse_publication(LINES[0], {"other"}) is None
+    assert parse_publication(LINES[1]) is None
+    assert parse_publication(LINES[2]) is None
+
+
+def test_parse_publication_of_truncated_lines():
+    assert parse_publication('Published to MQTT topic stage: {"Str": "m"}') is None
+    assert parse_publication('09:31:56,100 - Monitor - Published to MQTT topic stage: {"Str": "m"}') is None
+    assert parse_publication(LINES[0][:60]) is None
+
+
+def test_iter_publications(tmp_path):
+    log = tmp_path / "MAPE.log"
+    log.write_text("".join(LINES))
+    publications = list(iter_publications(log))
+    assert [(offset, topic, value) for offset, _, topic, value in publications] == [
+        (0, "stage", "m"),
+        (sum(map(len, LINES[:3])), "other", "a b"),
+    ]
+    assert publications[1][1].timestamp == datetime(2025, 5, 14, 9, 31, 56, 400000)
+    assert list(select_publications(iter_log_offsets(log))) == publications
+    assert list(select_publications(iter_log_offsets(log), {"stage"})) == publications[:1]
+
+
+def test_published_events():
+    records = [parse_log_line(line) for line in LINES]
+    assert published_events(records) == {"stage": ["m"], "other": ["a b"]}
+    assert published_events(records, {"other"}) == {"other": ["a b"]}
+
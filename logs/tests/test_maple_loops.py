@@ -0,0 +1,71 @@
+import numpy as np
+
+from maple_loops import (
+    ANOMALY_FOUND,
+    ANOMALY_OK,
+    ANOMALY_UNKNOWN,
+    STAGES,
+    loop_iterations,
+    loop_throughput,
+    stage_names,
+    transition_matrix,
+)
+from rle import RLEStream
+
+# Three iterations: complete with an anomaly, no anomaly, and abandoned after planning
+STAGE_EVENTS = [
+    (0, "start"),
+    (1, "m"), (2, "anom"), (3, "p"), (4, "l"), (5, "e"),
+    (6, "m"), (7, "aok"),
+    (8, "m"), (9, "anom"), (10, "p"),
+]
+
+
+def test_loop_iterations():
+    table = loop_iterations(STAGE_EVENTS)
+    assert table["iteration"].tolist() == [0, 1, 2]
+    assert table["start_step"].tolist() == [1, 6, 8]
+    assert table["end_step"].tolist() == [5, 7, 10]
+    assert [stage_names(m) for m in table["stages"].tolist()] == ["maple", "ma", "map"]
+    assert table["anomaly"].tolist() == [ANOMALY_FOUND, ANOMALY_OK, ANOMALY_FOUND]
+    assert table["abandoned"].tolist() == [False, False, True]
+
+
+def test_loop_iterations_of_rle_stream_counts_runs():
+    held = [(step, value) for step, value in STAGE_EVENTS for step in (2 * step, 2 * step + 1)]
+    table = loop_iterations(RLEStream.from_steps(held))
+    assert table["start_step"].tolist() == [2, 12, 16]
+    assert table["end_step"].tolist() == [10, 14, 20]
+
+
+def test_lifecycle_events():
+    table = loop_iterations([(0, "start_m"), (1, "end_m"), (2, "start_a"), (3, "end_a"), (4, "start_m")])
+    assert table["start_step"].tolist() == [0, 4]
+    assert table["end_step"].tolist() == [3, 4]
+    assert table["anomaly"].tolist() == [ANOMALY_UNKNOWN, ANOMALY_UNKNOWN]
+
+
+def test_no_monitor_stage():
+    table = loop_iterations([(0, "a"), (1, "p")])
+    assert len(table["iteration"]) == 0
+    assert loop_throughput(table) == {"iterations": 0, "abandoned": 0, "anomalies": 0}
+
+
+def test_transition_matrix():
+    matrix = transition_matrix(STAGE_EVENTS)
+    index = {s: i for i, s in enumerate(STAGES)}
+    assert matrix[index["m"], index["a"]] == 3
+    assert matrix[index["a"], index["m"]] == 1
+    assert matrix[index["e"], index["m"]] == 1
+    assert matrix.sum() == 9
+
+
+def test_loop_throughput():
+    table = loop_iterations(STAGE_EVENTS)
+    result = loop_throughput(table, step_times=np.arange(11) * 0.5)
+    assert result["iterations"] == 3
+    assert result["abandoned"] == 1
+    assert result["anomalies"] == 2
+    assert result["loops_per_step"] == 3 / 9
+    assert result["loops_per_second"] == 3 / 4.5
+    assert result["mean_duration_s"] == np.mean([2.0, 0.5, 1.0])
@@ -0,0 +1,89 @@
+import pytest
+
+import parallel_parse
+from mape_log import iter_publications, read_published_events
+from parallel_parse import (
+    line_aligned_ranges,
+    map_line_chunks,
+    publications_parallel,
+    published_events_parallel,
+    read_lola_output_rle_parallel,
+)
+from twc_output import read_lola_output_rle
+
+
+def write_log(path, n=300):
+    """A MAPE log with lines of varying length, non-ASCII values and no newline at the end."""
+    lines = []
+    for i in range(n):
+        stamp = f"2025-05-14 09:31:{i // 100 % 60:02d},{i % 1000:03d}"
+        if i % 3 == 0:
+            lines.append(f'{stamp} - Monitor - INFO - Published to MQTT topic stage: {{"Str": "m{"é" * (i % 5)}"}}')
+        elif i % 3 == 1:
+            lines.append(f'{stamp} - Analysis - INFO - Published to MQTT topic other: {{"Str": "{i}"}}')
+        else:
+            lines.append(f"{stamp} - Plan - INFO - {'x' * (i % 17)}")
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(parallel_parse, "MIN_CHUNK_BYTES", 1)
+
+
+@pytest.mark.parametrize("n_chunks", [1, 2, 3, 7, 50, 10000])
+def test_line_aligned_ranges(tmp_path, n_chunks):
+    path = write_log(tmp_path / "MAPE.log")
+    data = path.read_bytes()
+    ranges = line_aligned_ranges(path, n_chunks)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(start < end for start, end in ranges)
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges[:-1])
+    assert len(ranges) <= n_chunks
+
+
+def test_line_aligned_ranges_of_empty_file(tmp_path):
+    (tmp_path / "empty").write_bytes(b"")
+    assert line_aligned_ranges(tmp_path / "empty", 4) == []
+
+
+def test_chunks_join_to_the_lines_of_the_file(tmp_path, small_chunks):
+    path = write_log(tmp_path / "MAPE.log")
+    chunks = map_line_chunks(path, list, workers=4)
+    assert len(chunks) == 4
+    assert [line for chunk in chunks for line in chunk] == path.read_text(encoding="utf-8").splitlines(keepends=True)
+
+
+def test_published_events_parallel(tmp_path, small_chunks):
+    path = write_log(tmp_path / "MAPE.log")
+    assert published_events_parallel(path, 3) == read_published_events(path)
+    assert published_events_parallel(path, 3, {"stage"}) == read_published_events(path, {"stage"})
+
+
+def test_publications_parallel_keeps_byte_offsets(tmp_path, small_chunks):
+    path = write_log(tmp_path / "MAPE.log")
+    publications = publications_parallel(path, 3, {"stage"})
+    assert publications == list(iter_publications(path, {"stage"}))
+
+    data = path.read_bytes()
+    for offset, record, topic, value in publications:
+        assert data[offset:].split(b"\n", 1)[0].decode().endswith(f'{topic}: {{"Str": "{value}"}}')
+
+
+def test_read_lola_output_rle_parallel(tmp_path, small_chunks):
+    path = tmp_path / "TWC-output.txt"
+    with open(path, "w") as f:
+        for step in range(200):
+            f.write(f"m[{step}] = Bool({'true' if step // 7 % 2 else 'false'})\n")
+            f.write(f'stage[{step}] = Str("{"map"[step // 5 % 3]}")\n')
+
+    expected = read_lola_output_rle(path)
+    for streams in [None, ["m"]]:
+        parsed = read_lola_output_rle_parallel(path, streams, 3)
+        assert parsed.keys() == (expected.keys() if streams is None else set(streams))
+        for name, stream in parsed.items():
+            assert list(stream) == list(expected[name])
+            assert stream.n_runs == expected[name].n_runs
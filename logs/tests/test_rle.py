@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from rle import RLEBuilder, RLEStream, concatenate_rle, load_streams, save_streams, zero_index_rle
+
+
+def stream(pairs):
+    return RLEStream.from_steps(pairs)
+
+
+def test_from_steps_merges_equal_values():
+    s = stream([(0, "m"), (1, "m"), (2, "a"), (4, "a")])
+    assert s.starts.tolist() == [0, 2, 4]
+    assert s.ends.tolist() == [2, 3, 5]
+    assert s.values.tolist() == ["m", "a", "a"]
+    assert len(s) == 4
+    assert list(s) == [(0, "m"), (1, "m"), (2, "a"), (4, "a")]
+
+
+def test_value_at():
+    s = stream([(0, True), (1, True), (3, False)])
+    assert s.value_at(1) is True
+    assert s.value_at(3) is False
+    with pytest.raises(KeyError):
+        s.value_at(2)
+    with pytest.raises(KeyError):
+        s.value_at(-1)
+
+
+def test_intervals_and_split():
+    s = stream([(0, "m"), (1, "a"), (2, "m"), (3, "m")])
+    assert s.intervals("m").tolist() == [[0, 1], [2, 4]]
+    assert s.split() == {"m": [0, 2, 3], "a": [1]}
+    assert s.steps_of("p").tolist() == []
+
+
+def test_slice_clips_runs():
+    s = RLEStream([0, 10], [10, 20], [True, False])
+    part = s.slice(5, 15)
+    assert part.starts.tolist() == [5, 10]
+    assert part.ends.tolist() == [10, 15]
+    assert s.slice(20, 30).n_runs == 0
+
+
+def test_step_xy():
+    s = RLEStream([0, 3], [3, 5], [True, False])
+    xs, ys = s.step_xy()
+    assert xs.tolist() == [0, 3, 4]
+    assert ys.tolist() == [True, False, False]
+    xs, _ = s.step_xy(through_end=True)
+    assert xs.tolist() == [0, 3, 5]
+    assert len(RLEStream([], [], []).step_xy()[0]) == 0
+
+
+def test_boolean_ops_cover_common_steps():
+    a = RLEStream([0], [4], [True])
+    b = RLEStream([2, 3], [3, 6], [True, False])
+    assert list(a & b) == [(2, True), (3, False)]
+    assert list(a | b) == [(2, True), (3, True)]
+    assert list(~b) == [(2, False), (3, True), (4, True), (5, True)]
+
+
+def test_merged():
+    s = RLEStream([0, 2, 6], [2, 5, 7], [1, 1, 1]).merged()
+    assert s.starts.tolist() == [0, 6]
+    assert s.ends.tolist() == [5, 7]
+
+
+def test_builder_repeated_last_step_overwrites():
+    b = RLEBuilder()
+    for step, value in [(0, "m"), (1, "m"), (1, "a"), (2, "a"), (2, "a"), (3, "p"), (3, "a")]:
+        b.append(step, value)
+    s = b.build()
+    assert list(s) == [(0, "m"), (1, "a"), (2, "a"), (3, "a")]
+    assert s.n_runs == 2
+
+
+def test_builder_rejects_earlier_steps():
+    b = RLEBuilder()
+    b.append(5, True)
+    b.append(6, True)
+    with pytest.raises(ValueError):
+        b.append(4, True)
+
+
+def test_zero_index_rle():
+    shifted = zero_index_rle({"a": RLEStream([10], [12], [1]), "b": RLEStream([12], [13], [2])})
+    assert shifted["a"].starts.tolist() == [0]
+    assert shifted["b"].starts.tolist() == [2]
+
+
+def test_zero_index_rle_without_runs():
+    empty = {"a": RLEStream([], [], []), "b": RLEStream([], [], [])}
+    assert zero_index_rle(empty).keys() == empty.keys()
+    assert zero_index_rle({}) == {}
+
+
+def test_concatenate_rle_merges_across_chunks():
+    s = concatenate_rle([RLEStream([0], [3], [True]), RLEStream([], [], []), RLEStream([3], [5], [True])])
+    assert (s.starts.tolist(), s.ends.tolist()) == ([0], [5])
+    assert concatenate_rle([]).n_runs == 0
+
+
+def test_save_and_load_streams(tmp_path):
+    streams = {"m": RLEStream([0, 2], [2, 3], ["a", "b"]), "v": RLEStream([1], [4], [True])}
+    save_streams(tmp_path / "s.npz", streams)
+    loaded = load_streams(tmp_path / "s.npz")
+    assert loaded.keys() == streams.keys()
+    for name, s in streams.items():
+        assert list(loaded[name]) == list(s)
+        assert np.array_equal(loaded[name].starts, s.starts)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from scan_matrix import ScanMatrix, extract_scans, scan_summaries
+
+INF = np.inf
+
+
+def matrix(ranges):
+    ranges = np.array(ranges, dtype=np.float32)
+    return ScanMatrix(ranges, np.arange(len(ranges)), 0.0, 0.1, 0.1, 10.0)
+
+
+def per_beam_obstacles(ranges, sectors, distance):
+    """Obstacle beams per sector, counted beam by beam."""
+    counts = np.zeros((len(ranges), sectors), dtype=int)
+    beams = ranges.shape[1]
+    for row in range(len(ranges)):
+        for beam in range(beams):
+            if ranges[row, beam] < distance:
+                counts[row, beam * sectors // beams] += 1
+    return counts
+
+
+def test_summaries():
+    summary = scan_summaries(matrix([[0.2, 1.0, INF, np.nan], [-INF, 2.0, 3.0, 4.0]]), sectors=2)
+    assert summary["min_range"].tolist() == pytest.approx([0.2, 2.0])
+    assert summary["inf_ratio"].tolist() == [0.25, 0.25]
+    assert summary["nan_ratio"].tolist() == [0.25, 0.0]
+    assert summary["obstacles"].tolist() == [[1, 0], [1, 0]]
+
+
+@pytest.mark.parametrize("beams, sectors", [(8, 8), (10, 3), (5, 8), (3, 16), (1, 4), (360, 8)])
+def test_obstacles_per_sector(beams, sectors):
+    rng = np.random.default_rng(beams * 100 + sectors)
+    ranges = rng.uniform(0, 1, (7, beams)).astype(np.float32)
+    ranges[rng.random(ranges.shape) < 0.1] = -INF
+    ranges[rng.random(ranges.shape) < 0.1] = np.nan
+    summary = scan_summaries(matrix(ranges), sectors, obstacle_distance=0.5)
+    assert summary["obstacles"].tolist() == per_beam_obstacles(ranges, sectors, 0.5).tolist()
+
+
+def test_extract_scans(tmp_path):
+    scan = '{"angle_min": 0.0, "angle_increment": 0.5, "range_min": 0.1, "range_max": 8.0, "ranges": [%s]}'
+    log = tmp_path / "MAPE.log"
+    log.write_text(
+        f"2025-05-16 09:57:39,525 - Monitor - INFO - Received MQTT message: {scan % '1.0, Infinity, 0.3'} on topic: /Scan\n"
+        f"2025-05-16 09:57:39,600 - Analysis - INFO - Received MQTT message: {scan % '9.0, 9.0, 9.0'} on topic: /Scan\n"
+        f"2025-05-16 09:57:39,725 - Monitor - INFO - Received MQTT message: {scan % '2.0, -inf, 0.5'} on topic: /Scan\n"
+    )
+    scans = extract_scans(str(log))
+    assert scans.ranges.shape == (2, 3)
+    assert scans.ranges.tolist() == [[1.0, INF, pytest.approx(0.3)], [2.0, -INF, 0.5]]
+    assert (scans.times_us[1] - scans.times_us[0]) == 200000
+    assert (scans.angle_increment, scans.range_max) == (0.5, 8.0)
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from log_to_lola import convert
+from step_index import (
+    StepIndex,
+    index_path,
+    input_step_times,
+    load_step_index,
+    publication_index,
+    to_epoch_us,
+    write_step_index,
+)
+
+LOG_LINES = [
+    '2025-05-14 09:31:56,100 - Monitor - INFO - Published to MQTT topic stage: {"Str": "m"}\n',
+    "2025-05-14 09:31:56,150 - Analysis - INFO - Received MQTT message: m on topic: stage\n",
+    '2025-05-14 09:31:56,400 - Analysis - INFO - Published to MQTT topic stage: {"Str": "a"}\n',
+    '2025-05-14 09:31:57,000 - Plan - INFO - Published to MQTT topic other: {"Str": "x"}\n',
+    '2025-05-14 09:31:57,900 - Plan - INFO - Published to MQTT topic stage: {"Str": "p"}\n',
+]
+
+
+@pytest.fixture
+def run_folder(tmp_path):
+    (tmp_path / "MAPE.log").write_text("".join(LOG_LINES))
+    return tmp_path
+
+
+def test_write_and_read(tmp_path):
+    times = [to_epoch_us(datetime(2025, 5, 14, 9, 31, 56, 100000)) + i * 250000 for i in range(3)]
+    write_step_index(tmp_path / "x.steps", times, [0, 80, 160])
+
+    index = StepIndex(tmp_path / "x.steps")
+    assert len(index) == 3
+    assert index.time_us(2) == times[2]
+    assert index.offset(1) == 80
+    assert index.wall_time(0) == datetime(2025, 5, 14, 9, 31, 56, 100000)
+    assert index.step_at(datetime(2025, 5, 14, 9, 31, 56, 400000)) == 1
+    assert index.step_at(datetime(2025, 5, 14, 9, 31, 56)) == -1
+    assert np.allclose(index.step_times(), [0, 0.25, 0.5])
+
+
+def test_empty_index(tmp_path):
+    write_step_index(tmp_path / "x.steps", [], [])
+    index = StepIndex(tmp_path / "x.steps")
+    assert len(index) == 0
+    assert len(index.step_times()) == 0
+
+
+def test_not_a_step_index(tmp_path):
+    (tmp_path / "x.steps").write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        StepIndex(tmp_path / "x.steps")
+
+
+def test_publication_index(run_folder):
+    times, offsets = publication_index(run_folder / "MAPE.log", "stage")
+    starts = np.cumsum([0] + [len(line) for line in LOG_LINES])
+    assert offsets.tolist() == [starts[0], starts[2], starts[4]]
+    assert (times - times[0]).tolist() == [0, 300000, 1800000]
+
+
+def test_convert_round_trip(run_folder):
+    lola = str(run_folder / "MAPE.input")
+    convert(str(run_folder / "MAPE.log"), ["stage"], lola)
+
+    with open(lola) as f:
+        assert f.read() == '0: stage = "m"\n1: stage = "a"\n2: stage = "p"\n'
+    index = load_step_index(lola)
+    assert len(index) == 3
+    assert index.log_lines(run_folder / "MAPE.log", 1, context=1) == [LOG_LINES[2].rstrip("\n"), LOG_LINES[3].rstrip("\n")]
+    assert np.allclose(input_step_times(lola, "stage"), [0, 0.3, 1.8])
+
+
+def test_input_step_times_from_the_log(run_folder):
+    lola = str(run_folder / "MAPE.input")
+    assert load_step_index(lola) is None
+    assert np.allclose(input_step_times(lola, "stage"), [0, 0.3, 1.8])
+    assert input_step_times(str(run_folder / "missing" / "MAPE.input"), "stage") is None
+
+
+def test_convert_without_events(run_folder):
+    with pytest.raises(RuntimeError):
+        convert(str(run_folder / "MAPE.log"), ["nothing"], str(run_folder / "MAPE.input"))
+    assert not (run_folder / "MAPE.input").exists()
+    assert not (run_folder / index_path("MAPE.input")).exists()
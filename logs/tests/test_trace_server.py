@@ -0,0 +1,47 @@
+import pytest
+
+from trace_server import MAX_ZOOM, TILE_WIDTH, max_zoom, tile_range
+
+# A run of about 38 s in microseconds since the epoch
+EPOCH_RUN = (1747207933020000, 1747207970745001)
+
+
+@pytest.mark.parametrize("length, zoom", [(0, 0), (1, 0), (TILE_WIDTH - 1, 0), (TILE_WIDTH, 0),
+                                          (2 * TILE_WIDTH - 1, 0), (2 * TILE_WIDTH, 1), (TILE_WIDTH << 10, 10)])
+def test_max_zoom(length, zoom):
+    assert max_zoom((100, 100 + length)) == zoom
+
+
+def test_max_zoom_of_epoch_microseconds():
+    z = max_zoom(EPOCH_RUN)
+    length = EPOCH_RUN[1] - EPOCH_RUN[0]
+    assert z == 16
+    # One pixel covers at least one microsecond at the deepest level, and less one level deeper
+    assert length / 2**z / TILE_WIDTH >= 1
+    assert length / 2**(z + 1) / TILE_WIDTH < 1
+
+
+def test_max_zoom_is_capped():
+    assert max_zoom((0, TILE_WIDTH << (MAX_ZOOM + 5))) == MAX_ZOOM
+
+
+@pytest.mark.parametrize("z", [0, 1, 5, 16])
+def test_tiles_cover_the_domain(z):
+    length = EPOCH_RUN[1] - EPOCH_RUN[0]
+    ranges = [tile_range(length, z, x) for x in range(min(2**z, 64))] + [tile_range(length, z, 2**z - 1)]
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == pytest.approx(length)
+    for (_, hi), (lo, _) in zip(ranges, ranges[1:-1]):
+        assert hi == lo
+
+
+def test_tiles_at_max_zoom_keep_their_width():
+    # In absolute epoch microseconds, float64 has a resolution of 0.25 µs, so the tile bounds
+    # would be rounded. Relative to the start they stay exact.
+    start, end = EPOCH_RUN
+    z = max_zoom(EPOCH_RUN)
+    span = (end - start) / 2**z
+    for x in [0, 1, 2**z // 3, 2**z - 1]:
+        lo, hi = tile_range(end - start, z, x)
+        assert hi - lo == pytest.approx(span, rel=1e-12)
+        assert lo == pytest.approx(x * span, rel=1e-12)
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from rle import RLEStream
+from verdict_diff import ADDED, CHANGED, REMOVED, diff_outputs, diff_streams, summarize
+
+
+def per_step_diff(a: RLEStream, b: RLEStream):
+    """diff_streams computed step by step."""
+    da, db = dict(a), dict(b)
+    divergences = []
+    for step in sorted(da.keys() | db.keys()):
+        av, bv = da.get(step), db.get(step)
+        if step in da and step in db:
+            if av == bv:
+                continue
+            kind = CHANGED
+        else:
+            kind = REMOVED if step in da else ADDED
+        last = divergences[-1] if divergences else None
+        if last and last["end"] == step and (last["kind"], last["a"], last["b"]) == (kind, av, bv):
+            last["end"] = step + 1
+        else:
+            divergences.append({"start": step, "end": step + 1, "kind": kind, "a": av, "b": bv})
+    return divergences
+
+
+def test_identical_streams():
+    s = RLEStream([0, 5], [5, 9], [True, False])
+    assert diff_streams(s, RLEStream(s.starts, s.ends, s.values)) == []
+
+
+def test_kinds():
+    a = RLEStream([0, 4], [4, 8], [True, False])
+    b = RLEStream([0, 2, 6], [2, 6, 10], [True, False, False])
+    assert diff_streams(a, b) == [
+        {"start": 2, "end": 4, "kind": CHANGED, "a": True, "b": False},
+        {"start": 8, "end": 10, "kind": ADDED, "a": None, "b": False},
+    ]
+    assert diff_streams(b, a)[-1] == {"start": 8, "end": 10, "kind": REMOVED, "a": False, "b": None}
+
+
+def test_empty_stream():
+    s = RLEStream([3], [5], ["m"])
+    empty = RLEStream([], [], [])
+    assert diff_streams(s, empty) == [{"start": 3, "end": 5, "kind": REMOVED, "a": "m", "b": None}]
+    assert diff_streams(empty, empty) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_per_step_diff(seed):
+    rng = random.Random(seed)
+
+    def random_stream():
+        pairs = [(step, rng.random() < 0.5) for step in range(rng.randint(0, 5), rng.randint(5, 60)) if rng.random() < 0.9]
+        return RLEStream.from_steps(pairs)
+
+    a, b = random_stream(), random_stream()
+    assert diff_streams(a, b) == per_step_diff(a, b)
+
+
+def test_diff_outputs_and_summary():
+    a = {"m": RLEStream([0], [10], [True]), "x": RLEStream([0], [3], [1])}
+    b = {"m": RLEStream([0, 6], [6, 10], [True, False]), "y": RLEStream([0], [2], [1])}
+    diff = diff_outputs(a, b)
+    assert list(diff) == ["m", "x", "y"]
+    assert summarize(diff)["m"] == {CHANGED: 4, REMOVED: 0, ADDED: 0, "first": 6}
+    assert summarize(diff)["x"][REMOVED] == 3
+    assert list(diff_outputs(a, b, ["y"])) == ["y"]
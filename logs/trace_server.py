@@ -0,0 +1,670 @@
+#!/bin/env python3
+"""
+Local HTTP server to browse the run folders in a web browser.
+
+Every run gets a page with two zoomable panels: the MAPLE phases of MAPE.log over time, and
+the streams of a TWC output over time steps. The panels are made of PNG tiles rendered on
+demand. Zoom level `z` splits the run into 2^z tiles, and tile `x` covers the fraction
+[x / 2^z, (x + 1) / 2^z) of it. Only the runs, phases or scans inside a tile are drawn,
+decimated to one per pixel column. Tiles are computed relative to the start of the run, and
+the deepest zoom level of a run is the last one where a pixel covers at least one step or
+microsecond.
+
+Rendered tiles are kept in an LRU cache bounded in bytes, and so are the parsed runs. After
+each tile request, its neighbours and the tiles one level in and out are rendered in the
+background, so panning and zooming usually hit the cache.
+
+JSON endpoints:
+    /api/runs                                   the run folders
+    /api/run/RUN                                the streams of every TWC output and the timeline bounds
+    /api/slice/RUN/FILE/STREAM?start=&end=      the runs of a stream between two steps
+    /api/timeline/RUN?start_us=&end_us=         the phases and scans between two times
+
+Usage: python3 trace_server.py [--root .] [--port 8000]
+"""
+import argparse
+import html
+import io
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import numpy as np
+
+from run_tools import RunFolder
+from step_index import to_epoch_us
+
+TILE_WIDTH = 512
+TILE_HEIGHT = 24
+TILE_DPI = 100
+# Upper bound of the zoom level of any run, see `max_zoom`
+MAX_ZOOM = 40
+
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+MAX_RUNS = 4
+PREFETCH_QUEUE = 64
+
+# Rows returned by the JSON endpoints without a `limit`
+DEFAULT_LIMIT = 10000
+
+PHASE_COLOURS = {
+    'M': '#cbd7ea',
+    'A': '#b1d0ad',
+    'P': '#f4a918',
+    'L': '#3273d8',
+    'E': '#a251cb',
+}
+VALUE_COLOURS = ['#444488', '#ee6688', '#6688ee', '#b1d0ad', '#f4a918', '#a251cb', '#e02e44', '#cbd7ea']
+
+
+class NotFound(Exception):
+    pass
+
+
+class RunData:
+    """The parsed data of a run folder, as columns sorted by time or step."""
+
+    def __init__(self, path, jobs=1):
+        self.folder = RunFolder(path, jobs)
+        self.name = self.folder.name
+        self._lock = threading.Lock()
+        self._timeline = None
+
+    def output_files(self):
+        return self.folder.twc_files
+
+    def streams(self, file):
+        if file not in self.output_files():
+            raise NotFound(f"{self.name} has no TWC output {file}")
+        with self._lock:
+            return self.folder.twc_output(file)
+
+    def stream(self, file, name):
+        streams = self.streams(file)
+        if name not in streams:
+            raise NotFound(f"{self.name}/{file} has no stream {name}")
+        return streams[name]
+
+    def step_domain(self, file):
+        """(first step, end step) covered by the streams of a TWC output."""
+        streams = [s for s in self.streams(file).values() if s.n_runs]
+        if not streams:
+            return 0, 1
+        first = min(s.first_step for s in streams)
+        return first, max(max(s.end_step for s in streams), first + 1)
+
+    def timeline(self):
+        """Phases and scans of MAPE.log in microseconds since the epoch.
+
+        Returns:
+            dict: nodes (in plotting order), phase_node, phase_start, phase_end (sorted by
+                start), max_duration, scans, start_us and end_us
+        """
+        from plot_log_timing import phase_intervals
+
+        with self._lock:
+            if self._timeline is not None:
+                return self._timeline
+            if not os.path.exists(self.folder.file("MAPE.log")):
+                raise NotFound(f"{self.name} has no MAPE.log")
+
+            events, nodes = self.folder.timing
+            intervals = phase_intervals(events)
+            node_index = {node: i for i, node in enumerate(nodes)}
+            rows = [
+                (node_index[node], to_epoch_us(start), to_epoch_us(end))
+                for node, pairs in intervals.items()
+                for start, end in pairs
+            ]
+            phases = np.array(rows, dtype=np.int64).reshape(-1, 3)
+            phases = phases[np.argsort(phases[:, 1], kind="stable")]
+            times = [to_epoch_us(ts) for ts, _, _ in events]
+
+            self._timeline = {
+                "nodes": nodes,
+                "phase_node": phases[:, 0],
+                "phase_start": phases[:, 1],
+                "phase_end": phases[:, 2],
+                "max_duration": int((phases[:, 2] - phases[:, 1]).max()) if len(phases) else 0,
+                "scans": np.array([to_epoch_us(ts) for ts, _, typ in events if typ == ''], dtype=np.int64),
+                "start_us": min(times) if times else 0,
+                "end_us": max(times) + 1 if times else 1,
+            }
+            return self._timeline
+
+    def phases_between(self, start_us, end_us):
+        """Indices of the phases overlapping [start_us, end_us). The phases are sorted by
+        start, so only the ones starting at most the longest phase earlier are checked."""
+        t = self.timeline()
+        lo = np.searchsorted(t["phase_start"], start_us - t["max_duration"], side="left")
+        hi = np.searchsorted(t["phase_start"], end_us, side="left")
+        idx = np.arange(lo, hi)
+        return idx[t["phase_end"][lo:hi] > start_us]
+
+    def scans_between(self, start_us, end_us):
+        scans = self.timeline()["scans"]
+        return scans[np.searchsorted(scans, start_us):np.searchsorted(scans, end_us)]
+
+
+class LRUCache:
+    """Thread-safe LRU cache, bounded by the total size of its values."""
+
+    def __init__(self, max_size, size=lambda value: 1):
+        self.max_size = max_size
+        self.size = size
+        self._items = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._total -= self.size(self._items.pop(key))
+            self._items[key] = value
+            self._total += self.size(value)
+            while self._total > self.max_size and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._total -= self.size(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "size": self._total, "max_size": self.max_size}
+
+
+def max_zoom(domain):
+    """The deepest zoom level of a (start, end) domain of integer steps or microseconds where
+    a pixel of a tile still covers at least one of them."""
+    start, end = domain
+    return max(0, min(MAX_ZOOM, ((end - start) // TILE_WIDTH).bit_length() - 1))
+
+
+def tile_range(length, z, x):
+    """The part of a domain covered by tile `x` at zoom level `z`, relative to its start. Absolute
+    times in microseconds since the epoch are too large to split this finely in float64."""
+    span = length / 2**z
+    return x * span, (x + 1) * span
+
+
+def pixel_first(xs, lo, hi, width=TILE_WIDTH):
+    """Indices of the first of `xs` in every pixel column of [lo, hi)."""
+    if len(xs) <= width:
+        return np.arange(len(xs))
+    bins = ((np.clip(xs, lo, hi) - lo) * width // max(hi - lo, 1e-9)).astype(np.int64)
+    return np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+
+def new_tile(rows, lo, hi):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(TILE_WIDTH / TILE_DPI, rows * TILE_HEIGHT / TILE_DPI), dpi=TILE_DPI)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_xlim(lo, hi)
+    ax.set_ylim(-0.5, rows - 0.5)
+    ax.set_axis_off()
+    return fig, ax
+
+
+def save_tile(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def value_colour(value):
+    """The same colour for a value in every tile."""
+    return VALUE_COLOURS[zlib.crc32(str(value).encode()) % len(VALUE_COLOURS)]
+
+
+def render_stream_tile(stream, origin, lo, hi):
+    """Boolean streams are drawn as a verdict line, other streams as runs coloured by value.
+    `lo` and `hi` are steps relative to `origin`."""
+    from plot_lola import plot_binary
+
+    fig, ax = new_tile(1, lo, hi)
+    part = stream.slice(origin + int(np.floor(lo)), origin + int(np.ceil(hi))).shift(-origin)
+    if part.n_runs and part.values.dtype == bool:
+        ax.set_ylim(-1.5, 1.5)
+        plot_binary(part, ax=ax, binary_range=(-1, 1), max_points=TILE_WIDTH, through_end=True, color="#444488")
+    elif part.n_runs:
+        keep = pixel_first(part.starts, lo, hi)
+        min_width = (hi - lo) / TILE_WIDTH
+        widths = np.maximum(part.ends[keep] - part.starts[keep], min_width)
+        colours = [value_colour(v) for v in part.values[keep].tolist()]
+        ax.barh(np.zeros(len(keep)), widths, left=part.starts[keep], height=0.8, color=colours, linewidth=0)
+    return save_tile(fig)
+
+
+def render_timeline_tile(run: RunData, lo, hi):
+    """One row per node with its phases as bars, scans as grey lines behind them. `lo` and `hi`
+    are microseconds since the start of the run."""
+    t = run.timeline()
+    nodes = t["nodes"]
+    origin = t["start_us"]
+    fig, ax = new_tile(max(len(nodes), 1), lo, hi)
+    start_us, end_us = origin + int(np.floor(lo)), origin + int(np.ceil(hi))
+
+    scans = run.scans_between(start_us, end_us) - origin
+    if len(scans):
+        ax.vlines(scans[pixel_first(scans, lo, hi)], -0.5, len(nodes) - 0.5, colors="#aaaaaa", linewidth=0.5, zorder=1)
+
+    idx = run.phases_between(start_us, end_us)
+    min_width = (hi - lo) / TILE_WIDTH
+    for row, node in enumerate(nodes):
+        node_idx = idx[t["phase_node"][idx] == row]
+        starts = t["phase_start"][node_idx] - origin
+        keep = pixel_first(starts, lo, hi)
+        starts = starts[keep]
+        widths = np.maximum(t["phase_end"][node_idx[keep]] - origin - starts, min_width)
+        ax.barh(np.full(len(starts), row), widths, left=starts, height=0.8,
+                color=PHASE_COLOURS.get(node[:1], '#888888'), linewidth=0, zorder=2)
+    return save_tile(fig)
+
+
+class TraceExplorer:
+    """Parsed runs and rendered tiles, both in bounded LRU caches."""
+
+    def __init__(self, root=".", jobs=1, cache_bytes=TILE_CACHE_BYTES, max_runs=MAX_RUNS, prefetch=True):
+        self.root = root
+        self.jobs = jobs
+        self.runs = LRUCache(max_runs)
+        self.tiles = LRUCache(cache_bytes, size=len)
+        self._run_lock = threading.Lock()
+        # Rendering is serialized: matplotlib is not thread-safe, and there is no gain on one core
+        self._render_lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(1) if prefetch else None
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def close(self):
+        if self._prefetcher:
+            self._prefetcher.shutdown(wait=False, cancel_futures=True)
+
+    def run_names(self):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name)) and not name.startswith((".", "__"))
+            and (os.path.exists(os.path.join(self.root, name, "MAPE.log"))
+                 or any(n.lower().startswith("twc") for n in os.listdir(os.path.join(self.root, name))))
+        )
+
+    def run(self, name) -> RunData:
+        if "/" in name or name.startswith(".") or not os.path.isdir(os.path.join(self.root, name)):
+            raise NotFound(f"No run {name}")
+        with self._run_lock:
+            run = self.runs.get(name)
+            if run is None:
+                run = RunData(os.path.join(self.root, name), self.jobs)
+                self.runs.put(name, run)
+            return run
+
+    def domain(self, key):
+        """(start, end) of the run a tile is part of: microseconds for the timeline, steps for streams."""
+        run = self.run(key[0])
+        if key[1] == "timeline":
+            t = run.timeline()
+            return t["start_us"], t["end_us"]
+        return run.step_domain(key[2])
+
+    def render(self, key, z, x):
+        start, end = self.domain(key)
+        lo, hi = tile_range(end - start, z, x)
+        run = self.run(key[0])
+        with self._render_lock:
+            if key[1] == "timeline":
+                return render_timeline_tile(run, lo, hi)
+            return render_stream_tile(run.stream(key[2], key[3]), start, lo, hi)
+
+    def tile(self, key, z, x, prefetch=True):
+        """PNG of a tile, from the cache or rendered.
+
+        Args:
+            key (tuple): (run, "timeline") or (run, "stream", file, stream)
+        """
+        if not (0 <= z <= max_zoom(self.domain(key)) and 0 <= x < 2**z):
+            raise NotFound(f"No tile {z}/{x}")
+        png = self.tiles.get((*key, z, x))
+        if png is None:
+            png = self.render(key, z, x)
+            self.tiles.put((*key, z, x), png)
+        if prefetch and self._prefetcher:
+            self.prefetch(key, z, x)
+        return png
+
+    def prefetch(self, key, z, x):
+        """Render the neighbours of a tile, and the tiles one zoom level in and out, in the background."""
+        neighbours = [(z, x - 1), (z, x + 1), (z + 1, 2 * x), (z + 1, 2 * x + 1), (z - 1, x // 2)]
+        deepest = max_zoom(self.domain(key))
+        for nz, nx in neighbours:
+            if not (0 <= nz <= deepest and 0 <= nx < 2**nz) or (*key, nz, nx) in self.tiles:
+                continue
+            with self._pending_lock:
+                if (*key, nz, nx) in self._pending or len(self._pending) >= PREFETCH_QUEUE:
+                    continue
+                self._pending.add((*key, nz, nx))
+            self._prefetcher.submit(self._prefetch_one, key, nz, nx)
+
+    def _prefetch_one(self, key, z, x):
+        try:
+            self.tile(key, z, x, prefetch=False)
+        finally:
+            with self._pending_lock:
+                self._pending.discard((*key, z, x))
+
+    def run_info(self, name):
+        run = self.run(name)
+        info = {"name": name, "outputs": dict(), "timeline": None}
+        for file in run.output_files():
+            start, end = run.step_domain(file)
+            info["outputs"][file] = {
+                "start": start,
+                "end": end,
+                "max_zoom": max_zoom((start, end)),
+                "streams": {
+                    stream_name: {
+                        "dtype": str(s.values.dtype),
+                        "runs": s.n_runs,
+                        "steps": len(s),
+                    }
+                    for stream_name, s in run.streams(file).items()
+                },
+            }
+        try:
+            t = run.timeline()
+            info["timeline"] = {"nodes": t["nodes"], "start_us": t["start_us"], "end_us": t["end_us"],
+                                "max_zoom": max_zoom((t["start_us"], t["end_us"])),
+                                "phases": len(t["phase_start"]), "scans": len(t["scans"])}
+        except NotFound:
+            pass
+        return info
+
+    def stream_slice(self, name, file, stream, start=None, end=None, limit=DEFAULT_LIMIT):
+        s = self.run(name).stream(file, stream)
+        start = s.first_step if start is None and s.n_runs else start or 0
+        end = s.end_step if end is None and s.n_runs else end or 0
+        part = s.slice(start, end)
+        return {
+            "stream": stream,
+            "start": start,
+            "end": end,
+            "truncated": part.n_runs > limit,
+            "starts": part.starts[:limit].tolist(),
+            "ends": part.ends[:limit].tolist(),
+            "values": part.values[:limit].tolist(),
+        }
+
+    def timeline_slice(self, name, start_us=None, end_us=None, limit=DEFAULT_LIMIT):
+        run = self.run(name)
+        t = run.timeline()
+        start_us = t["start_us"] if start_us is None else start_us
+        end_us = t["end_us"] if end_us is None else end_us
+        idx = run.phases_between(start_us, end_us)
+        scans = run.scans_between(start_us, end_us)
+        return {
+            "start_us": start_us,
+            "end_us": end_us,
+            "truncated": len(idx) > limit or len(scans) > limit,
+            "phases": [
+                {"node": t["nodes"][n], "start_us": s, "end_us": e}
+                for n, s, e in zip(t["phase_node"][idx[:limit]].tolist(),
+                                   t["phase_start"][idx[:limit]].tolist(),
+                                   t["phase_end"][idx[:limit]].tolist())
+            ],
+            "scans_us": scans[:limit].tolist(),
+        }
+
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Runs</title></head>
+<body style="font-family: sans-serif"><h1>Runs</h1><ul>{items}</ul></body></html>
+"""
+
+# Each panel has a view [u0, u1) on its domain, as fractions of the run. Tiles are picked at
+# the zoom level where one tile is about as wide as TILE_WIDTH screen pixels.
+RUN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{name}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1em; }}
+.panel {{ margin-bottom: 2em; }}
+.row {{ display: flex; align-items: center; }}
+.label {{ width: 14em; text-align: right; padding-right: .5em; font-size: 80%; overflow: hidden; }}
+.track {{ position: relative; overflow: hidden; flex: 1; background: #fafafa; border-bottom: 1px solid #ddd; cursor: grab; }}
+.track img {{ position: absolute; top: 0; height: 100%; image-rendering: pixelated; }}
+.axis {{ display: flex; justify-content: space-between; margin-left: 14.5em; font-size: 80%; color: #555; }}
+</style></head>
+<body>
+<h1>{name}</h1>
+<p>Scroll to zoom, drag to pan. <a href="/">All runs</a></p>
+<select id="file"></select>
+<div id="panels"></div>
+<script>
+const TILE_WIDTH = {tile_width}, TILE_HEIGHT = {tile_height};
+const run = {name_json};
+const enc = encodeURIComponent;
+
+function panel(title, domain, maxZoom, unit, tracks) {{
+  const div = document.createElement('div');
+  div.className = 'panel';
+  div.innerHTML = '<h2>' + title + '</h2>';
+  const view = {{u0: 0, u1: 1}};
+  const rows = tracks.map(t => {{
+    const row = document.createElement('div');
+    row.className = 'row';
+    row.innerHTML = '<div class="label">' + t.label + '</div>';
+    const track = document.createElement('div');
+    track.className = 'track';
+    track.style.height = (t.rows * TILE_HEIGHT) + 'px';
+    row.appendChild(track);
+    div.appendChild(row);
+    return {{track, url: t.url, imgs: new Map()}};
+  }});
+  const axis = document.createElement('div');
+  axis.className = 'axis';
+  div.appendChild(axis);
+
+  function draw() {{
+    const width = rows[0].track.clientWidth;
+    const span = view.u1 - view.u0;
+    const z = Math.max(0, Math.min(maxZoom, Math.round(Math.log2(width / TILE_WIDTH / span))));
+    const n = 2 ** z;
+    const x0 = Math.max(0, Math.floor(view.u0 * n)), x1 = Math.min(n - 1, Math.floor(view.u1 * n));
+    for (const r of rows) {{
+      const wanted = new Set();
+      for (let x = x0; x <= x1; x++) {{
+        const key = z + '/' + x;
+        wanted.add(key);
+        let img = r.imgs.get(key);
+        if (!img) {{
+          img = document.createElement('img');
+          img.src = r.url + '/' + key + '.png';
+          img.draggable = false;
+          r.track.appendChild(img);
+          r.imgs.set(key, img);
+        }}
+        img.style.left = ((x / n - view.u0) / span * width) + 'px';
+        img.style.width = (width / n / span) + 'px';
+      }}
+      for (const [key, img] of r.imgs) {{
+        if (!wanted.has(key)) {{ img.remove(); r.imgs.delete(key); }}
+      }}
+    }}
+    const at = u => domain[0] + u * (domain[1] - domain[0]);
+    const fmt = v => unit === 's' ? ((v - domain[0]) / 1e6).toFixed(3) + ' s' : Math.round(v) + '';
+    axis.innerHTML = '<span>' + fmt(at(view.u0)) + '</span><span>' + fmt(at((view.u0 + view.u1) / 2)) +
+      '</span><span>' + fmt(at(view.u1)) + '</span>';
+  }}
+
+  function clamp() {{
+    const span = Math.min(1, Math.max(view.u1 - view.u0, 2 ** -maxZoom));
+    view.u0 = Math.min(Math.max(view.u0, 0), 1 - span);
+    view.u1 = view.u0 + span;
+  }}
+  div.addEventListener('wheel', e => {{
+    e.preventDefault();
+    const rect = rows[0].track.getBoundingClientRect();
+    const f = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 1);
+    const u = view.u0 + f * (view.u1 - view.u0);
+    const scale = e.deltaY > 0 ? 1.25 : 0.8;
+    view.u0 = u - (u - view.u0) * scale;
+    view.u1 = u + (view.u1 - u) * scale;
+    clamp(); draw();
+  }}, {{passive: false}});
+  let drag = null;
+  div.addEventListener('mousedown', e => {{ drag = {{x: e.clientX, u0: view.u0, u1: view.u1}}; }});
+  window.addEventListener('mouseup', () => {{ drag = null; }});
+  window.addEventListener('mousemove', e => {{
+    if (!drag) return;
+    const du = (drag.x - e.clientX) / rows[0].track.clientWidth * (drag.u1 - drag.u0);
+    view.u0 = drag.u0 + du; view.u1 = drag.u1 + du;
+    clamp(); draw();
+  }});
+  window.addEventListener('resize', draw);
+  document.getElementById('panels').appendChild(div);
+  draw();
+  return div;
+}}
+
+fetch('/api/run/' + enc(run)).then(r => r.json()).then(info => {{
+  if (info.timeline) {{
+    const t = info.timeline;
+    panel('MAPE.log', [t.start_us, t.end_us], t.max_zoom, 's', [{{
+      label: t.nodes.slice().reverse().join('<br>'), rows: Math.max(t.nodes.length, 1),
+      url: '/tile/' + enc(run) + '/timeline'
+    }}]);
+  }}
+  const select = document.getElementById('file');
+  let current = null;
+  function show(file) {{
+    if (current) current.remove();
+    const o = info.outputs[file];
+    current = panel(file, [o.start, o.end], o.max_zoom, 'step', Object.keys(o.streams).map(s => ({{
+      label: s, rows: 1, url: '/tile/' + enc(run) + '/stream/' + enc(file) + '/' + enc(s)
+    }})));
+  }}
+  for (const file of Object.keys(info.outputs)) select.add(new Option(file, file));
+  select.onchange = () => show(select.value);
+  if (select.options.length) show(select.value); else select.remove();
+}});
+</script>
+</body></html>
+"""
+
+
+class TraceRequestHandler(BaseHTTPRequestHandler):
+    explorer: TraceExplorer = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            self.route(parts, query)
+        except NotFound as e:
+            self.send_error(404, str(e))
+        except (ValueError, KeyError) as e:
+            self.send_error(400, str(e))
+        except BrokenPipeError:
+            pass
+
+    def route(self, parts, query):
+        explorer = self.explorer
+        match parts:
+            case []:
+                items = "".join(
+                    f'<li><a href="/view/{quote(name)}">{html.escape(name)}</a></li>' for name in explorer.run_names()
+                )
+                self.send(INDEX_PAGE.format(items=items).encode(), "text/html; charset=utf-8")
+            case ["view", name]:
+                explorer.run(name)
+                page = RUN_PAGE.format(
+                    name=html.escape(name), name_json=json.dumps(name),
+                    tile_width=TILE_WIDTH, tile_height=TILE_HEIGHT,
+                )
+                self.send(page.encode(), "text/html; charset=utf-8")
+            case ["api", "runs"]:
+                self.send_json(explorer.run_names())
+            case ["api", "run", name]:
+                self.send_json(explorer.run_info(name))
+            case ["api", "slice", name, file, stream]:
+                self.send_json(explorer.stream_slice(
+                    name, file, stream, int_arg(query, "start"), int_arg(query, "end"),
+                    int_arg(query, "limit") or DEFAULT_LIMIT,
+                ))
+            case ["api", "timeline", name]:
+                self.send_json(explorer.timeline_slice(
+                    name, int_arg(query, "start_us"), int_arg(query, "end_us"), int_arg(query, "limit") or DEFAULT_LIMIT
+                ))
+            case ["api", "cache"]:
+                self.send_json({"tiles": explorer.tiles.stats(), "runs": explorer.runs.stats()})
+            case ["tile", name, "timeline", z, x]:
+                self.send_tile((name, "timeline"), z, x)
+            case ["tile", name, "stream", file, stream, z, x]:
+                self.send_tile((name, "stream", file, stream), z, x)
+            case _:
+                raise NotFound(self.path)
+
+    def send_tile(self, key, z, x):
+        if not x.endswith(".png"):
+            raise NotFound(self.path)
+        png = self.explorer.tile(key, int(z), int(x[:-len(".png")]))
+        self.send(png, "image/png", cache=True)
+
+    def send_json(self, data):
+        self.send(json.dumps(data).encode(), "application/json")
+
+    def send(self, body, content_type, cache=False):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cache:
+            self.send_header("Cache-Control", "max-age=3600")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def int_arg(query, name):
+    return int(query[name]) if name in query else None
+
+
+def serve(root=".", host="127.0.0.1", port=8000, jobs=1, cache_bytes=TILE_CACHE_BYTES):
+    explorer = TraceExplorer(root, jobs, cache_bytes)
+    handler = type("Handler", (TraceRequestHandler,), {"explorer": explorer})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving {os.path.abspath(root)} on http://{host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        explorer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Browse the run folders in a web browser")
+    parser.add_argument("--root", help="Directory containing the run folders", type=str, default=".")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    parser.add_argument("-j", "--jobs", help="Parse large files with this many processes", type=int, default=1)
+    parser.add_argument("--cache-mb", help="Size of the tile cache in MiB", type=int, default=TILE_CACHE_BYTES >> 20)
+    args = parser.parse_args()
+
+    serve(args.root, args.host, args.port, args.jobs, args.cache_mb << 20)
@@ -0,0 +1,115 @@
+"""
+Reading the output of the trustworthiness checker (TWC).
+
+Kept free of matplotlib, so tools that only convert or analyse outputs start quickly.
+"""
+import re
+
+from rle import RLEBuilder, RLEStream, zero_index_rle
+
+
+OUTPUT_LINE_PATTERN = re.compile(r'([a-zA-Z][a-zA-Z0-9]*)\[(\d+)\] = (Bool\((false|true)\)|Str\("([^"]+)\"\)|Int\((\d+)\)|Float\((\d+\.\d+)\))\s+')
+
+def parse_output_line(line):
+    """Parse a single "stream[i] = Type(value)" line of the TWC output.
+
+    Returns:
+        tuple | None: (stream_name, step, value) or None if the line is not a stream output
+    """
+    m = OUTPUT_LINE_PATTERN.match(line)
+    if not m:
+        return None
+
+    stream_name, stream_idx, whole_value, bool_value, string_value, int_value, float_value = m.groups()
+    v = None
+    if whole_value.startswith('Bool'):
+        v = bool_value == 'true'
+    elif whole_value.startswith('Str'):
+        v = string_value
+    elif whole_value.startswith('Int'):
+        v = int(int_value)
+    elif whole_value.startswith('Float'):
+        v = float(float_value)
+    return stream_name, int(stream_idx), v
+
+def read_lola_output(file, streams:list):
+    parsed = dict()
+
+    with open(file, 'r') as f:
+        for line in f:
+            out = parse_output_line(line)
+            if out and out[0] in streams:
+                stream_name, i, v = out
+
+                if not i in parsed:
+                    parsed[i] = dict()
+                parsed[i][stream_name] = v
+    return parsed
+
+def read_lola_output_rle(file, streams:list=None):
+    """Read the given streams of a TWC output directly into run-length encoded streams.
+    Without a list of streams, all streams in the file are read."""
+    with open(file, 'r') as f:
+        return collect_output_rle(f, streams)
+
+def collect_output_rle(lines, streams:list=None):
+    """Collect TWC output lines into run-length encoded streams, see `read_lola_output_rle`."""
+    collector = OutputCollector(streams)
+    for line in lines:
+        collector.feed(line)
+    return collector.build()
+
+class OutputCollector:
+    """Collect TWC output lines into run-length encoded streams one line at a time, e.g.
+    while the checker is still running."""
+
+    def __init__(self, streams:list=None):
+        self.streams = streams
+        self.builders = {s: RLEBuilder() for s in streams} if streams is not None else dict()
+
+    def feed(self, line):
+        out = parse_output_line(line)
+        if not out:
+            return
+        stream_name, i, v = out
+        if stream_name not in self.builders:
+            if self.streams is not None:
+                return
+            self.builders[stream_name] = RLEBuilder()
+        self.builders[stream_name].append(i, v)
+
+    def build(self):
+        return {k: b.build() for k, b in self.builders.items() if b.starts}
+
+def read_streams(file, streams:list):
+    return zero_index_rle(read_lola_output_rle(file, streams))
+
+def zero_index(d:dict):
+    least_index = min(d.keys())
+    d_new = dict()
+    for k,v in d.items():
+        d_new[k-least_index] = v
+    return d_new
+
+def split_dict(d:dict):
+    values = dict()
+
+    for n,dv in d.items():
+        for k,v in dv.items():
+            if not k in values:
+                values[k] = []
+            values[k].append((n,v))
+    
+    return values
+
+
+def split_merged_stream(l: list[tuple]):
+    if isinstance(l, RLEStream):
+        return l.split()
+
+    unmerged = dict()
+    for v in l:
+        if not v[1] in unmerged:
+            unmerged[v[1]] = []
+        unmerged[v[1]].append(v[0])
+    return unmerged
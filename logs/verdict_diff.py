@@ -0,0 +1,198 @@
+#!/bin/env python3
+"""
+Find where two TWC outputs diverge, e.g. the output of two spec versions on the same input
+or a run before and after a fix.
+
+Streams are compared run by run on their run-length encoding, so the cost depends on the
+number of value changes, not on the trace length. The leading runs both outputs share are
+skipped with one vectorized comparison before the remaining runs are split into segments.
+
+Every divergence is a range of steps of one stream where:
+    - "changed": both outputs have a value, but a different one
+    - "removed": only the first output has a value
+    - "added": only the second output has a value
+
+Usage: python3 verdict_diff.py A.txt B.txt [--align] [--json diff.jsonl] [--plot diff.pdf]
+The exit code is 1 if the outputs diverge.
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from lola_spec import read_spec
+from rle import RLEStream, zero_index_rle
+from twc_output import read_lola_output_rle
+
+CHANGED = "changed"
+REMOVED = "removed"
+ADDED = "added"
+
+
+def common_prefix_runs(a: RLEStream, b: RLEStream):
+    """Number of leading runs that are identical in both streams."""
+    n = min(a.n_runs, b.n_runs)
+    same = (
+        (a.starts[:n] == b.starts[:n])
+        & (a.ends[:n] == b.ends[:n])
+        & (a.values[:n].astype(object) == b.values[:n].astype(object)).astype(bool)
+    )
+    mismatch = np.flatnonzero(~same)
+    return int(mismatch[0]) if len(mismatch) else n
+
+
+def diff_streams(a: RLEStream, b: RLEStream):
+    """Divergences between two versions of a stream.
+
+    Returns:
+        list[dict]: {"start", "end" (exclusive), "kind", "a", "b"} in step order. Adjacent
+            divergences of the same kind and values are merged.
+    """
+    k = common_prefix_runs(a, b)
+    if k == a.n_runs == b.n_runs:
+        return []
+    a = RLEStream(a.starts[k:], a.ends[k:], a.values[k:])
+    b = RLEStream(b.starts[k:], b.ends[k:], b.values[k:])
+
+    bounds = np.unique(np.concatenate([a.starts, a.ends, b.starts, b.ends]))
+    seg_starts = bounds[:-1]
+    seg_ends = bounds[1:]
+
+    def locate(s: RLEStream):
+        i = np.searchsorted(s.starts, seg_starts, side="right") - 1
+        covered = i >= 0
+        i = np.maximum(i, 0)
+        if s.n_runs:
+            covered &= seg_starts < s.ends[i]
+        else:
+            covered[:] = False
+        return i, covered
+
+    ia, in_a = locate(a)
+    ib, in_b = locate(b)
+    a_values = a.values.astype(object)[ia] if a.n_runs else np.full(len(ia), None, dtype=object)
+    b_values = b.values.astype(object)[ib] if b.n_runs else np.full(len(ib), None, dtype=object)
+
+    changed = in_a & in_b & (a_values != b_values).astype(bool)
+    removed = in_a & ~in_b
+    added = ~in_a & in_b
+
+    divergences = []
+    for j in np.flatnonzero(changed | removed | added).tolist():
+        kind = CHANGED if changed[j] else REMOVED if removed[j] else ADDED
+        av = a_values[j] if in_a[j] else None
+        bv = b_values[j] if in_b[j] else None
+        start, end = int(seg_starts[j]), int(seg_ends[j])
+        last = divergences[-1] if divergences else None
+        if last and last["end"] == start and (last["kind"], last["a"], last["b"]) == (kind, av, bv):
+            last["end"] = end
+        else:
+            divergences.append({"start": start, "end": end, "kind": kind, "a": av, "b": bv})
+    return divergences
+
+
+def diff_outputs(a: dict, b: dict, streams: list = None):
+    """Divergences of all streams of two outputs.
+
+    Args:
+        a, b (dict[str, RLEStream]): Streams of the two outputs
+        streams (list, optional): Only compare these streams
+
+    Returns:
+        dict[str, list[dict]]: Divergences of every stream that differs, see `diff_streams`
+    """
+    if streams is None:
+        streams = list(dict.fromkeys(list(a) + list(b)))
+    empty = RLEStream([], [], [])
+
+    result = dict()
+    for name in streams:
+        divergences = diff_streams(a.get(name, empty), b.get(name, empty))
+        if divergences:
+            result[name] = divergences
+    return result
+
+
+def summarize(diff: dict):
+    """Steps per kind of divergence and the first diverging step of every stream."""
+    summary = dict()
+    for name, divergences in diff.items():
+        s = {CHANGED: 0, REMOVED: 0, ADDED: 0, "first": divergences[0]["start"]}
+        for d in divergences:
+            s[d["kind"]] += d["end"] - d["start"]
+        summary[name] = s
+    return summary
+
+
+def write_diff_json(diff: dict, f):
+    """Write one JSON object per divergence."""
+    for name, divergences in diff.items():
+        for d in divergences:
+            f.write(json.dumps({"stream": name, **d}) + "\n")
+
+
+def plot_diff_overlay(a: dict, b: dict, diff: dict, outfile, labels=("a", "b")):
+    """One row per diverging stream. Boolean verdicts of both outputs are drawn as steps,
+    the diverging ranges are shaded."""
+    from plot_lola import plot_binary, plt
+
+    names = list(diff)
+    fig, axes = plt.subplots(len(names), 1, figsize=(9, 1.2 * len(names) + 0.5), sharex=True, squeeze=False)
+    colours = {CHANGED: "#e02e44", REMOVED: "#f4a918", ADDED: "#3273d8"}
+
+    for ax, name in zip(axes[:, 0], names):
+        for stream, label, offset, colour in [(a.get(name), labels[0], -0.1, "#444488"), (b.get(name), labels[1], 0.1, "#b1d0ad")]:
+            if stream is not None and stream.n_runs and stream.values.dtype == bool:
+                plot_binary(stream, ax=ax, binary_range=(-1 + offset, 1 + offset), color=colour, label=label)
+        for d in diff[name]:
+            ax.axvspan(d["start"], d["end"], color=colours[d["kind"]], alpha=0.3, linewidth=0)
+        ax.set_yticks([-1, 1])
+        ax.set_yticklabels(["false", "true"])
+        ax.set_ylim(-1.4, 1.4)
+        ax.set_ylabel(name, rotation=0, ha="right", va="center")
+        ax.grid(axis="x")
+
+    labelled = [ax for ax in axes[:, 0] if ax.get_legend_handles_labels()[0]]
+    if labelled:
+        labelled[0].legend(loc="upper right", fontsize=7)
+    axes[-1, 0].set_xlabel("Time step")
+    fig.savefig(outfile, bbox_inches="tight")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the verdicts of two TWC outputs")
+    parser.add_argument("a", help="First TWC output", type=str)
+    parser.add_argument("b", help="Second TWC output", type=str)
+    parser.add_argument("-s", "--stream", help="Only compare this stream (repeatable)", action="append")
+    parser.add_argument("--spec", help="Only compare the output streams declared in this LOLA spec", type=str)
+    parser.add_argument("--align", help="Compare from the first step of each output on", action="store_true")
+    parser.add_argument("--json", help="Write the divergences as JSON lines (- for stdout)", type=str)
+    parser.add_argument("--plot", help="Write an overlay figure of the diverging streams", type=str)
+    args = parser.parse_args()
+    if args.spec:
+        args.stream = (args.stream or []) + list(read_spec(args.spec).outputs)
+
+    a = read_lola_output_rle(args.a, args.stream)
+    b = read_lola_output_rle(args.b, args.stream)
+    if args.align:
+        a, b = zero_index_rle(a), zero_index_rle(b)
+
+    diff = diff_outputs(a, b, args.stream)
+
+    for name, s in summarize(diff).items():
+        print(
+            f"{name}: first at step {s['first']}, "
+            f"{s[CHANGED]} changed, {s[REMOVED]} removed, {s[ADDED]} added steps",
+            file=sys.stderr,
+        )
+    if args.json == "-":
+        write_diff_json(diff, sys.stdout)
+    elif args.json:
+        with open(args.json, "w") as f:
+            write_diff_json(diff, f)
+    if args.plot and diff:
+        plot_diff_overlay(a, b, diff, args.plot, labels=(args.a, args.b))
+
+    sys.exit(1 if diff else 0)